@@ -3,6 +3,8 @@ from users.models.base_model import BaseModel
 
 
 class HeroSection(BaseModel):
+    cache_versioned = True
+
     title = models.CharField(max_length=256, verbose_name='Title')
     cta_text = models.CharField(max_length=256, verbose_name='CTA Button Text')
     short_description = models.CharField(max_length=256, verbose_name='Short Description')
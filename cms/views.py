@@ -6,6 +6,7 @@ from rest_framework import filters
 from django_filters.rest_framework import DjangoFilterBackend
 
 from setup.views import BaseModelViewSet
+from setup.views import ResponseCacheMixin
 from setup.export import ExportData
 
 from .models import HeroSection
@@ -28,7 +29,7 @@ class HeroSectionModelViewSet(BaseModelViewSet, ExportData):
 
 
 @extend_schema(tags=["CMS"])
-class HeroSectionCustomer(GenericViewSet, ListModelMixin):
+class HeroSectionCustomer(ResponseCacheMixin, GenericViewSet, ListModelMixin):
     authentication_classes = [SessionAuthentication]
     permission_classes = (AllowAny,)
     queryset = HeroSection.objects.all().order_by('-id')
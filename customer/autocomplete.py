@@ -0,0 +1,85 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.contrib.postgres.search import TrigramWordSimilarity
+
+from masterdata.models import Brand
+from masterdata.models import Category
+from product.models import Products
+from product.models import TagsText
+
+AUTOCOMPLETE_LIMIT = getattr(settings, 'AUTOCOMPLETE_LIMIT', 5)
+AUTOCOMPLETE_MAX_LIMIT = 20
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_CACHE_TIMEOUT = getattr(settings, 'AUTOCOMPLETE_CACHE_TIMEOUT', 60)
+
+TAG_SQL = """
+    SELECT tag FROM (
+        SELECT DISTINCT ON (lower(tag)) tag, word_similarity(%s, tag) AS similarity
+        FROM {products} p, unnest(p.tags) AS tag
+        WHERE p.id IN ({matched}) AND tag %%> %s
+        ORDER BY lower(tag), similarity DESC
+    ) suggestion
+    ORDER BY similarity DESC, tag
+    LIMIT %s
+"""
+
+
+def similar(queryset, term, field='name'):
+    """
+        Rows of the queryset whose `field` has a word similar to the term, most similar first.
+        The `%>` operator is served by the gin_trgm_ops index of the field.
+    """
+    return queryset.annotate(similarity=TrigramWordSimilarity(term, field)).filter(
+        **{f'{field}__trigram_word_similar': term}
+    ).order_by('-similarity', field)
+
+
+def get_tag_suggestions(term, limit):
+    # Products are narrowed on the indexed tag text, the matching tags are then picked one by one
+    matched = similar(
+        Products.objects.filter(card__variant_count__gt=0).annotate(tags_text=TagsText('tags')),
+        term, field='tags_text'
+    ).values('pk')[:limit * 10]
+    matched_sql, matched_params = matched.query.sql_with_params()
+
+    sql = TAG_SQL.format(products=Products._meta.db_table, matched=matched_sql)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [term, *matched_params, term, limit])
+        return [tag for tag, in cursor.fetchall()]
+
+
+def get_suggestions(term, limit=AUTOCOMPLETE_LIMIT):
+    """
+        Function to get the search suggestions of a partially typed term.
+
+        Products, brands, categories and tags are matched on their trigram indexes,
+        so misspelt and half typed words still match. Results are cached for a short while.
+
+        :param term: The text typed by the customer.
+        :param limit: Maximum suggestions of each kind.
+        :return: dict with the product, brand, category and tag suggestions.
+    """
+    term = ' '.join(term.split()).lower()
+    if len(term) < AUTOCOMPLETE_MIN_LENGTH:
+        return {'products': [], 'brands': [], 'categories': [], 'tags': []}
+
+    cache_key = f'autocomplete:{limit}:{md5(term.encode()).hexdigest()}'
+    suggestions = cache.get(cache_key)
+    if suggestions is not None:
+        return suggestions
+
+    products = similar(Products.objects.filter(card__variant_count__gt=0), term)
+    brands = similar(Brand.objects.filter(is_active=True), term)
+    categories = similar(Category.objects.filter(is_active=True), term)
+
+    suggestions = {
+        'products': list(products.values('id', 'name')[:limit]),
+        'brands': list(brands.values('id', 'name')[:limit]),
+        'categories': list(categories.values('id', 'name', 'handle')[:limit]),
+        'tags': get_tag_suggestions(term, limit),
+    }
+    cache.set(cache_key, suggestions, AUTOCOMPLETE_CACHE_TIMEOUT)
+    return suggestions
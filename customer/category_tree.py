@@ -0,0 +1,63 @@
+import json
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from masterdata.models import Category
+from setup.cache import get_version
+from setup.utils import presign_urls
+
+# Image urls are presigned, the blob must expire before they do
+CATEGORY_TREE_CACHE_TIMEOUT = getattr(settings, 'CATEGORY_TREE_CACHE_TIMEOUT', 30 * 60)
+
+
+def build_category_tree():
+    """
+        Function to build the active category tree from a single query.
+
+        :return: list of the root categories, each with its `sub_category` list.
+    """
+    storage = Category._meta.get_field('image').storage
+    rows = Category.objects.filter(is_active=True).order_by('name').values(
+        'id', 'name', 'handle', 'image', 'is_main_menu', 'is_top_category', 'parent_category_id'
+    )
+
+    rows = list(rows)
+    urls = presign_urls(storage, [row['image'] for row in rows])
+
+    nodes = {}
+    for row in rows:
+        image = row.pop('image')
+        row['image'] = urls[image] if image else ''
+        row['sub_category'] = []
+        nodes[row['id']] = row
+
+    roots = []
+    for node in nodes.values():
+        parent_id = node.pop('parent_category_id')
+        if parent_id is None:
+            roots.append(node)
+        elif parent_id in nodes:
+            nodes[parent_id]['sub_category'].append(node)
+        # Categories below an inactive parent are left out with it
+    return roots
+
+
+def get_category_tree():
+    """
+        Function to get the category tree as a JSON blob and its ETag.
+
+        The blob is kept in the process cache under the `category` version, any
+        category write bumps the version and the next request builds it again.
+
+        :return: tuple of the ETag and the JSON bytes.
+    """
+    cache_key = f'category-tree:{get_version("category")}'
+    cached = cache.get(cache_key)
+    if cached is None:
+        blob = json.dumps(build_category_tree(), cls=DjangoJSONEncoder).encode()
+        cached = (f'"{md5(blob).hexdigest()}"', blob)
+        cache.set(cache_key, cached, CATEGORY_TREE_CACHE_TIMEOUT)
+    return cached
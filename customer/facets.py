@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+
+from masterdata.models import Brand
+from masterdata.models import Category
+from masterdata.models import CategoryClosure
+from product.models import Products
+
+# Upper bounds of the selling price buckets, the last bucket is open ended
+PRICE_BUCKETS = getattr(settings, 'PRODUCT_FACET_PRICE_BUCKETS', [500, 1000, 2000, 5000])
+
+FACET_SQL = """
+    WITH matched AS (
+        SELECT id, brand_id, preferred_gender, selling_price, variant_attributes
+        FROM {products} WHERE id IN ({matched})
+    ),
+    product_category AS (
+        SELECT DISTINCT pc.products_id AS product_id, closure.ancestor_id AS category_id
+        FROM {product_categories} pc
+        JOIN {categories} c ON c.id = pc.category_id AND c.deleted = false
+        JOIN {category_closure} closure ON closure.descendant_id = pc.category_id
+        JOIN {categories} ancestor ON ancestor.id = closure.ancestor_id AND ancestor.deleted = false
+        WHERE pc.products_id IN (SELECT id FROM matched)
+    )
+    SELECT 'category', pcat.category_id::text, MAX(c.name), COUNT(DISTINCT pcat.product_id)
+    FROM product_category pcat JOIN {categories} c ON c.id = pcat.category_id
+    GROUP BY pcat.category_id
+    UNION ALL
+    SELECT 'brand', m.brand_id::text, MAX(b.name), COUNT(*)
+    FROM matched m JOIN {brands} b ON b.id = m.brand_id
+    GROUP BY m.brand_id
+    UNION ALL
+    SELECT 'preferred_gender', m.preferred_gender, NULL, COUNT(*)
+    FROM matched m
+    GROUP BY m.preferred_gender
+    UNION ALL
+    SELECT 'price', width_bucket(m.selling_price, %s::numeric[])::text, NULL, COUNT(*)
+    FROM matched m
+    GROUP BY 2
+    UNION ALL
+    SELECT 'attribute', attribute.key, attribute_value, COUNT(DISTINCT m.id)
+    FROM matched m,
+        jsonb_each(m.variant_attributes) AS attribute,
+        jsonb_array_elements_text(attribute.value) AS attribute_value
+    GROUP BY attribute.key, attribute_value
+"""
+
+
+def get_product_facets(queryset):
+    """
+        Function to count the filter values of the products in the queryset.
+
+        Every facet comes from a single grouped SQL statement over the matched
+        products. Categories also count the products of their sub categories at any depth.
+
+        :param queryset: The filtered products queryset.
+        :return: Dictionary of facet name to the list of values and counts.
+    """
+    facets = {
+        'categories': [],
+        'brands': [],
+        'preferred_gender': [],
+        'price': [],
+        'attributes': {},
+    }
+
+    try:
+        matched_sql, matched_params = queryset.order_by().values('pk').query.sql_with_params()
+    except EmptyResultSet:
+        return facets
+
+    sql = FACET_SQL.format(
+        products=Products._meta.db_table,
+        product_categories=Products.categories.through._meta.db_table,
+        categories=Category._meta.db_table,
+        category_closure=CategoryClosure._meta.db_table,
+        brands=Brand._meta.db_table,
+        matched=matched_sql,
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*matched_params, PRICE_BUCKETS))
+        rows = cursor.fetchall()
+
+    bounds = [0, *PRICE_BUCKETS, None]
+    for facet, value, label, count in rows:
+        if facet == 'category':
+            facets['categories'].append({'id': int(value), 'name': label, 'count': count})
+        elif facet == 'brand':
+            facets['brands'].append({'id': int(value), 'name': label, 'count': count})
+        elif facet == 'preferred_gender':
+            facets['preferred_gender'].append({'value': value, 'count': count})
+        elif facet == 'price':
+            bucket = int(value)
+            facets['price'].append({'min': bounds[bucket], 'max': bounds[bucket + 1], 'count': count})
+        elif facet == 'attribute':
+            facets['attributes'].setdefault(value, []).append({'value': label, 'count': count})
+
+    facets['price'].sort(key=lambda bucket: bucket['min'])
+    return facets
@@ -1,5 +1,4 @@
 import django_filters as filters
-from django.db.models import Q
 
 from product.models import Products
 from product.models import Variant
@@ -12,21 +11,21 @@ from customer.models import Review
 
 from orders.models import Order
 
+from product.filters import in_categories
+
 
 class CustomerProductFilter(filters.FilterSet):
     categories = filters.CharFilter(method='generate_categories_view')
     brand = filters.CharFilter(method='generate_brand_view')  
     preferred_gender = filters.CharFilter(field_name='preferred_gender')
+    in_stock = filters.BooleanFilter(method='generate_in_stock_view')
 
     def generate_categories_view(self, queryset, value, *args, **kwargs):
         try:
             elements = args[0].split(',')
             categories_value = [int(num) for num in elements]
             if categories_value:
-                queryset = queryset.filter(
-                    Q(categories__in=categories_value) |
-                    Q(categories__parent_category__in=categories_value)
-                )
+                queryset = queryset.filter(in_categories(categories_value))
         except Exception as e:
             print('Exception occurred at the product section filter : ', str(e))
         return queryset
@@ -41,9 +40,12 @@ class CustomerProductFilter(filters.FilterSet):
             print('Exception occurred at the product brand filter : ', str(e))
         return queryset
 
+    def generate_in_stock_view(self, queryset, name, value):
+        return queryset.filter(total_stock__gt=0) if value else queryset.filter(total_stock__lte=0)
+
     class Meta:
         model = Products
-        fields = ['categories', 'brand', 'preferred_gender']
+        fields = ['categories', 'brand', 'preferred_gender', 'in_stock']
 
 
 class CustomerVariantFilter(filters.FilterSet):
@@ -54,10 +56,7 @@ class CustomerVariantFilter(filters.FilterSet):
             elements = args[0].split(',')
             categories_value = [int(num) for num in elements]
             if categories_value:
-                queryset = queryset.filter(
-                    Q(product__categories__in=categories_value) |
-                    Q(product__categories__parent_category__in=categories_value)
-                )
+                queryset = queryset.filter(in_categories(categories_value, 'product_id'))
         except Exception as e:
             print('Exception occurred at the product section filter : ', str(e))
         return queryset
@@ -0,0 +1,136 @@
+import json
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+from inventory.models import Tax
+from masterdata.models import AttributeGroup
+from masterdata.models import Brand
+from masterdata.models import Category
+from masterdata.models import Dimension
+from product.models import Collection
+from product.models import LookBook
+from product.serializers import CollectionModelSerializerGET
+from product.serializers import LookBookModelSerializerGET
+from setup.cache import bump_version
+from setup.cache import get_versions
+from setup.cache import model_version_name
+from setup.cache import require_cache_versioned
+from setup.serializer import prefetch_lookups
+from setup.tasks import run_in_background
+from customer.utils import get_wishlisted_products
+
+HOME_SNAPSHOT_CACHE_ALIAS = getattr(settings, 'HOME_SNAPSHOT_CACHE_ALIAS', 'shared')
+# Image urls are presigned, the snapshot must expire before they do
+HOME_SNAPSHOT_CACHE_TIMEOUT = getattr(settings, 'HOME_SNAPSHOT_CACHE_TIMEOUT', 30 * 60)
+
+# Bumped when a home page collection or look book, or one of their products, changes
+HOME_SNAPSHOT_VERSION = 'home'
+HOME_MEMBERS_KEY = 'home-snapshot:members'
+
+# Reference tables rendered in the snapshot, a write to them moves the snapshot key as well
+HOME_REFERENCE_MODELS = (Brand, Category, AttributeGroup, Tax, Dimension)
+require_cache_versioned(*HOME_REFERENCE_MODELS)
+
+# Section name: the model, its serializer and the relation of its items
+HOME_SECTIONS = {
+    'collections': (Collection, CollectionModelSerializerGET, 'collection_items'),
+    'look_books': (LookBook, LookBookModelSerializerGET, 'look_book_items'),
+}
+
+
+def iter_products(name, rows):
+    """
+        The rendered products of the rows of a section.
+    """
+    items = HOME_SECTIONS[name][2]
+    for row in rows:
+        for item in row[items]:
+            # Collection items render the product itself, look book items nest it
+            yield item['product'] if name == 'look_books' else item
+
+
+def build_home_snapshot():
+    """
+        Function to render the collections and look books shown on the home page.
+
+        The rows are read with the prefetch plan of the serializers, a fixed number of
+        queries whatever the number of rows. They are rendered with the `shared` context,
+        the same for every visitor: `is_wishlisted` is filled in by `get_home_section`.
+
+        :return: dict of the section name and its rendered rows.
+    """
+    sections = {}
+    for name, (model, serializer_class, _) in HOME_SECTIONS.items():
+        select_related, prefetch_related = prefetch_lookups(serializer_class, model)
+        queryset = model.objects.filter(is_in_home_page=True).select_related(
+            *select_related
+        ).prefetch_related(*prefetch_related).order_by('-id')
+        sections[name] = serializer_class(queryset, many=True, context={'shared': True}).data
+    return sections
+
+
+def get_home_snapshot():
+    """
+        Function to get the home page snapshot, built again when its version moved.
+
+        The snapshot is kept in the shared cache, so one build serves every worker.
+        Writes to its collections, look books and products rebuild it right after they
+        commit (see `refresh_home_snapshot`), requests seldom wait for a build.
+
+        :return: dict of the section name and tuple of its ETag, JSON bytes and product ids.
+    """
+    names = [HOME_SNAPSHOT_VERSION] + [model_version_name(model) for model in HOME_REFERENCE_MODELS]
+    versions = get_versions(*names)
+    key = f'home-snapshot:{md5(json.dumps([versions[name] for name in names]).encode()).hexdigest()}'
+
+    cache = caches[HOME_SNAPSHOT_CACHE_ALIAS]
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = {}
+        for name, rows in build_home_snapshot().items():
+            blob = json.dumps(rows, cls=DjangoJSONEncoder).encode()
+            product_ids = {product['id'] for product in iter_products(name, rows)}
+            snapshot[name] = (f'"{md5(blob).hexdigest()}"', blob, product_ids)
+        cache.set(key, snapshot, HOME_SNAPSHOT_CACHE_TIMEOUT)
+        cache.set(HOME_MEMBERS_KEY, set().union(*(section[2] for section in snapshot.values())), None)
+    return snapshot
+
+
+def get_home_section(request, name):
+    """
+        Function to get a section of the snapshot for the request.
+
+        :param request: The current request, the products wishlisted by its user are marked.
+        :param name: The section name, collections or look_books.
+        :return: tuple of the ETag (None when the section was marked for the user) and the JSON bytes.
+    """
+    etag, blob, product_ids = get_home_snapshot()[name]
+    wishlisted = get_wishlisted_products(request) & product_ids
+    if not wishlisted:
+        return etag, blob
+
+    rows = json.loads(blob)
+    for product in iter_products(name, rows):
+        product['is_wishlisted'] = product['id'] in wishlisted
+    return None, json.dumps(rows, cls=DjangoJSONEncoder).encode()
+
+
+def refresh_home_snapshot(product_ids=None):
+    """
+        Function to rebuild the snapshot once the current transaction commits.
+
+        :param product_ids: The changed products, the snapshot is only rebuilt when one of
+                            them is shown on the home page. None rebuilds it in any case.
+    """
+    if product_ids is not None:
+        members = caches[HOME_SNAPSHOT_CACHE_ALIAS].get(HOME_MEMBERS_KEY)
+        # Before the first build nothing is known about the members
+        if members is not None and not members.intersection(product_ids):
+            return
+
+    bump_version(HOME_SNAPSHOT_VERSION)
+    # Queued after the bump, the build reads the new version
+    run_in_background(get_home_snapshot)
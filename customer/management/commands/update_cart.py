@@ -13,8 +13,7 @@ class Command(BaseCommand):
             variant = Variant.objects.get(pk=cart_item.product_variant_id)
             print("variant.stock",variant.stock)
             print("cartItem.quantity",cart_item.quantity)
-            variant.stock += cart_item.quantity
-            variant.save()
+            variant.restore_stock(cart_item.quantity)
             
 
 
@@ -26,6 +26,8 @@ def generate_return_id():
 
 
 class WishList(BaseModel):
+    cache_versioned = True
+
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='user_wishlist', verbose_name='User', null=True
     )
@@ -135,6 +137,7 @@ class ReviewImage(BaseModel):
 
     file = models.FileField(upload_to='review/image', verbose_name='Image', blank=True, null=True)
     name = models.CharField(max_length=250, blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Renditions')
 
 
 class Return(BaseModel):
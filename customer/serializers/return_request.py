@@ -4,9 +4,13 @@ from customer.models import Return
 
 from users.serializers import UserDataModelSerializer
 from masterdata.serializers import ReturnReasonModelSerializerGET
+from setup.serializer import ReferenceRelatedField
+from setup.serializer import ReferenceListSerializer
 
 
 class ReturnModelSerializer(serializers.ModelSerializer):
+    serializer_related_field = ReferenceRelatedField
+
     class Meta:
         model = Return
         fields = (
@@ -48,6 +52,7 @@ class ReturnModelSerializerGET(serializers.ModelSerializer):
     class Meta:
         model = Return
         fields = '__all__'
+        list_serializer_class = ReferenceListSerializer
 
 
 class ReturnApproveModelSerializer(serializers.ModelSerializer):
@@ -8,6 +8,7 @@ from customer.models import ReviewImage
 from product.models import Variant
 
 from users.serializers import UserDataModelSerializer
+from setup.serializer import RenditionsField
 
 
 class CartModelSerializer(serializers.ModelSerializer):
@@ -153,7 +154,7 @@ class WishListGETSerializer(serializers.ModelSerializer):
 class ReviewSerializerPOST(serializers.ModelSerializer):
     review_images = serializers.ListField(
         child=serializers.FileField(max_length=1000000, allow_empty_file=False, use_url=False),
-        write_only=True
+        write_only=True, required=False
     )
 
     class Meta:
@@ -198,6 +199,7 @@ class ReviewSerializer(serializers.ModelSerializer):
 
 
 class ReviewImageSerializer(serializers.ModelSerializer):
+    renditions = RenditionsField()
     created_by = serializers.SerializerMethodField()
     updated_by = serializers.SerializerMethodField()
 
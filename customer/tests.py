@@ -1,3 +1,46 @@
+from decimal import Decimal
+
+from django.test import RequestFactory
 from django.test import TestCase
 
-# Create your tests here.
+from customer.home_snapshot import build_home_snapshot
+from customer.home_snapshot import iter_products
+from customer.models import WishList
+from masterdata.models import Brand
+from product.models import Collection
+from product.models import CollectionItems
+from product.models import LookBook
+from product.models import LookBookItems
+from product.models import Products
+from setup.middleware.request import CurrentRequestMiddleware
+from users.models import User
+
+
+class HomeSnapshotTestCase(TestCase):
+
+    def test_snapshot_built_in_a_request_has_no_wishlist(self):
+        user = User.objects.create(username='customer', is_customer=True)
+        product = Products.objects.create(
+            name='Shirt', sku='SKU1', price=Decimal('999'), selling_price=Decimal('499'),
+            brand=Brand.objects.create(name='Acme'),
+        )
+        CollectionItems.objects.create(
+            collection=Collection.objects.create(name='Summer', is_in_home_page=True), product=product
+        )
+        LookBookItems.objects.create(
+            look_book=LookBook.objects.create(name='Beach', is_in_home_page=True), product=product
+        )
+        WishList.objects.create(user=user, product=product)
+
+        # Rebuilt on a cache miss of a request of a customer with the product in their wishlist
+        request = RequestFactory().get('/customer/collections/home/')
+        request.user = user
+        CurrentRequestMiddleware.set_request(request)
+        try:
+            sections = build_home_snapshot()
+        finally:
+            CurrentRequestMiddleware.del_request()
+
+        products = [product for name, rows in sections.items() for product in iter_products(name, rows)]
+        self.assertEqual(len(products), 2)
+        self.assertFalse(any(product['is_wishlisted'] for product in products))
@@ -31,5 +31,6 @@ router.register('manage/reviews', views.ReviewModelViewSet)
 
 urlpatterns = [
     path('add-review/', views.ReviewModelView.as_view(), name='add-review'),
+    path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete'),
 ]
 urlpatterns += router.urls
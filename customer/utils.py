@@ -0,0 +1,55 @@
+from rest_framework import serializers
+
+from setup.middleware.request import CurrentRequestMiddleware
+
+from customer.models import WishList
+
+
+def get_wishlisted_products(request=None, username=None):
+    """
+        Function to get the ids of the products wishlisted by a user.
+
+        The ids are fetched with a single query and kept on the request, so every
+        product serialized in the same request is answered from memory.
+
+        :param request: The current request, defaults to the one in CurrentRequestMiddleware.
+        :param username: Look up the wishlist of this user instead of the authenticated one.
+        :return: Set of product ids.
+    """
+    request = request or CurrentRequestMiddleware.get_request()
+    if request is None:
+        return set()
+
+    # DRF wraps the django request, keep the ids on the inner one so both share them
+    request = getattr(request, '_request', request)
+
+    if username:
+        key = ('username', username)
+        wishlist = WishList.objects.filter(user__username=username)
+    else:
+        user = getattr(request, 'user', None)
+        if not user or not user.is_authenticated:
+            return set()
+        key = ('user', user.pk)
+        wishlist = WishList.objects.filter(user=user)
+
+    loaded = request.__dict__.setdefault('_wishlisted_products', {})
+    if key not in loaded:
+        loaded[key] = set(wishlist.filter(deleted=False).values_list('product_id', flat=True))
+    return loaded[key]
+
+
+def reserve_stock(product_variant, quantity):
+    """
+        Function to take a cart quantity out of the variant stock, a negative quantity puts it back.
+
+        :param product_variant: The variant instance.
+        :param quantity: The quantity added to the cart.
+        :raise ValidationError: When the stock is short, so the enclosing transaction rolls back.
+    """
+    try:
+        product_variant.update_stock(quantity)
+    except ValueError:
+        raise serializers.ValidationError({
+            'product_variant': 'Only have limited stock.!'
+        })
@@ -17,4 +17,6 @@ from .review import ReviewModelViewSet
 from .return_request import CustomerReturnViewSet
 from .return_request import ManageCustomerReturn
 
-from .customer import CustomProductListView
\ No newline at end of file
+from .customer import CustomProductListView
+
+from .autocomplete import AutocompleteView
@@ -0,0 +1,47 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import AllowAny
+from rest_framework.authentication import SessionAuthentication
+from rest_framework import status
+from django.utils.cache import patch_cache_control
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import OpenApiParameter
+
+from customer.autocomplete import get_suggestions
+from customer.autocomplete import AUTOCOMPLETE_LIMIT
+from customer.autocomplete import AUTOCOMPLETE_MAX_LIMIT
+from customer.autocomplete import AUTOCOMPLETE_CACHE_TIMEOUT
+
+
+@extend_schema(
+    tags=["Customer"],
+    parameters=[
+        OpenApiParameter('q', str, description='Partially typed search text'),
+        OpenApiParameter('limit', int, description='Maximum suggestions of each kind'),
+    ]
+)
+class AutocompleteView(APIView):
+    """
+        Search as you type suggestions.
+
+        Parameters:
+            request (HttpRequest): The HTTP request object, `q` is the typed text.
+
+        Returns:
+            Response: The matching product, brand and category names and tags.
+    """
+    authentication_classes = [SessionAuthentication]
+    permission_classes = (AllowAny,)
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT)), AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+
+        response = Response(
+            get_suggestions(request.query_params.get('q', ''), max(limit, 1)),
+            status=status.HTTP_200_OK
+        )
+        patch_cache_control(response, public=True, max_age=AUTOCOMPLETE_CACHE_TIMEOUT)
+        return response
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import action
@@ -8,7 +9,7 @@ from drf_spectacular.utils import extend_schema
 from setup.permissions import IsCustomer
 
 from customer.models import Cart
-from product.models import Variant
+from customer.utils import reserve_stock
 
 from customer.serializers import CartModelSerializer
 from customer.serializers import UpdateCartProductSerializer
@@ -64,14 +65,13 @@ class CartModelViewSet(GenericViewSet):
 
         serializer = AddToCartSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(cart=cart)
 
-        # Reduce the stock of the product variant
         product_variant = serializer.validated_data.get('product_variant')
         quantity = serializer.validated_data.get('quantity')
-        variant = Variant.objects.get(pk=product_variant.id)
-        variant.stock -= quantity
-        variant.save()
+        with transaction.atomic():
+            serializer.save(cart=cart)
+            # Reduce the stock of the product variant
+            reserve_stock(product_variant, quantity)
 
         return Response({
             'data': serializer.data,
@@ -103,9 +103,10 @@ class CartModelViewSet(GenericViewSet):
         cart_item = cart.cartitems.get(
             cart=cart, product_variant=product_variant
         )
-        cart_item.quantity += quantity
-        cart_item.save()
-        Variant.objects.get(pk=product_variant.id).update_stock(quantity)
+        with transaction.atomic():
+            cart_item.quantity += quantity
+            cart_item.save()
+            reserve_stock(product_variant, quantity)
 
         return Response({
             'data': serializer.data,
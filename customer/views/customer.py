@@ -1,5 +1,12 @@
+from collections import defaultdict
+
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Prefetch
+from django.http import HttpResponse
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.db.models import Count
+from django.db.models import OuterRef
+from django.db.models import Subquery
 
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.views import APIView
@@ -15,9 +22,16 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.authentication import SessionAuthentication
+from rest_framework.settings import api_settings
+
+from setup.filters import FullTextSearchFilter
 
 from masterdata.models import Brand
 from masterdata.models import Category
+from masterdata.models import Dimension
+from masterdata.models import Attribute
+from masterdata.models import AttributeGroup
+from inventory.models import Tax
 from masterdata.serializers import CategoryModelSerializerGET
 
 from product.models import Products
@@ -25,7 +39,10 @@ from product.models import ProductImage
 from product.models import Variant
 from product.models import VariantAttributes
 from product.models import Collection
+from product.models import CollectionItems
 from product.models import LookBook
+from product.models import LookBookItems
+from product.models import ProductCard
 from product.serializers import ProductsModelSerializer
 from masterdata.models import Category
 from orders.models import Order
@@ -47,10 +64,21 @@ from customer.filters import CustomerCollectionFilter
 from customer.filters import CustomerLookBookFilter
 from customer.filters import CustomerOrderFilter
 from customer.models import WishList
+from customer.utils import get_wishlisted_products
+from customer.facets import get_product_facets
+from customer.category_tree import get_category_tree
+from customer.home_snapshot import get_home_section
+
+from setup.views import SparseFieldsMixin
+from setup.views import ResponseCacheMixin
+from setup.views import PrefetchPlanMixin
+
+# Models rendered by ProductsModelSerializerGET
+PRODUCT_MODELS = (Products, Brand, Category, Dimension, Tax, ProductImage, WishList)
 
 
 @extend_schema(tags=["Customer"])
-class CustomerProductViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin):
+class CustomerProductViewSet(ResponseCacheMixin, SparseFieldsMixin, GenericViewSet, ListModelMixin, RetrieveModelMixin):
     """
         Get the list of variant products.
 
@@ -65,9 +93,13 @@ class CustomerProductViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin)
     queryset = Products.objects.all()
     serializer_class = ProductsModelSerializerGET
     retrieve_serializer_class = ProductsModelSerializerGET
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_class = CustomerProductFilter
     search_fields = ['name', 'brand__name']
+    search_vector_field = 'search_vector'
+    sparse_actions = ('list', 'retrieve', 'facets')
+    conditional_actions = ('list', 'retrieve', 'facets')
+    conditional_models = PRODUCT_MODELS + (Variant, VariantAttributes)
 
     def get_serializer_class(self):
         if self.action == 'list' or self.action == 'retrieve' and self.retrieve_serializer_class:
@@ -78,7 +110,11 @@ class CustomerProductViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin)
         """
         Exclude products with no variants.
         """
-        return Products.objects.annotate(variant_count=Count('product_variant')).filter(variant_count__gt=0)
+        return Products.objects.annotate(variant_count=Count('product_variant')).filter(
+            variant_count__gt=0
+        ).select_related(
+            'brand', 'gst', 'dimension', 'created_by', 'updated_by'
+        ).prefetch_related('categories', 'product_images')
 
     @action(detail=True, methods=['GET'], url_path='other-variants')
     def other_variants(self, request, *args, **kwargs):
@@ -91,37 +127,47 @@ class CustomerProductViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin)
             status=status.HTTP_200_OK
         )
 
+    @action(detail=False, methods=['GET'], url_path='facets')
+    def facets(self, request, *args, **kwargs):
+        """
+            API to fetch the filtered products along with the count of every filter value.
+
+            Parameters:
+                request (HttpRequest): The HTTP request object, takes the same filters as the product list.
+
+            Returns:
+                Response: The paginated products and the category, brand, gender, price and
+                variant attribute counts of the matched products.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        facets = get_product_facets(queryset)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response({'results': self.get_serializer(queryset, many=True).data})
+
+        response.data['facets'] = facets
+        return response
+
 class CustomProductListView(GenericViewSet, ListModelMixin, RetrieveModelMixin):
     """
     Optimized view to list variant products with pagination.
+    The list is served from the denormalized product cards.
     """
     authentication_classes = [SessionAuthentication]
     permission_classes = (AllowAny,)
     queryset = Products.objects.filter(deleted=False)
     serializer_class = ProductsModelSerializerGET
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_class = CustomerProductFilter
     search_fields = ['name', 'brand__name']
+    search_vector_field = 'search_vector'
+    ordering_fields = ['id', 'name', 'price', 'selling_price', 'rating', 'total_stock']
 
     def get_queryset(self):
-        """
-        Optimized queryset to fetch only required fields and relationships.
-        """
-        queryset = (
-            self.queryset.annotate(variant_count=Count('product_variant'))
-            .filter(variant_count__gt=0)
-            .only('id', 'name', 'brand__id', 'brand__name', 'price', 'selling_price', 'rating')
-            .prefetch_related(
-                Prefetch(
-                    'product_images',
-                    queryset=ProductImage.objects.only('id', 'image')
-                ),
-                Prefetch(
-                    'product_variant__variant__attributes',
-                    queryset=VariantAttributes.objects.only('id', 'name', 'value')
-                )
-            )
-        )
+        queryset = self.queryset
         # Wishlist filter logic
         wishlisted = self.request.query_params.get('wishlist')
         username = self.request.query_params.get('username')
@@ -129,40 +175,59 @@ class CustomProductListView(GenericViewSet, ListModelMixin, RetrieveModelMixin):
             queryset = Products.objects.filter(product_wishlist__user__username=username, product_wishlist__deleted=False)
         return queryset
 
+    def get_card_queryset(self, queryset):
+        """
+        Product cards of the filtered products, in the requested ordering.
+        Search results without an explicit ordering keep the rank order of the search.
+        """
+        cards = ProductCard.objects.filter(
+            variant_count__gt=0,
+            product__in=queryset.values('pk')
+        )
+
+        rank = FullTextSearchFilter.rank_annotation
+        if rank in queryset.query.annotations and api_settings.ORDERING_PARAM not in self.request.query_params:
+            return cards.annotate(**{
+                rank: Subquery(queryset.filter(pk=OuterRef('product_id')).order_by().values(rank)[:1])
+            }).order_by(f'-{rank}', '-product_id')
+
+        ordering = filters.OrderingFilter().get_ordering(self.request, queryset, self) or ['-id']
+        # The card is keyed by the product, so `id` orders on the product key
+        ordering = [{'id': 'product_id', '-id': '-product_id'}.get(field, field) for field in ordering]
+        return cards.order_by(*ordering)
+
     def list(self, request, *args, **kwargs):
         """
         List products with pagination and optimized data fetching.
         """
-        queryset = self.filter_queryset(self.get_queryset())
+        queryset = self.get_card_queryset(self.filter_queryset(self.get_queryset()))
         page = self.paginate_queryset(queryset)
 
         # Use paginated response if applicable
         product_list = [
-            self.get_product_data(product) for product in (page if page is not None else queryset)
+            self.get_product_data(card) for card in (page if page is not None else queryset)
         ]
         if page is not None:
             return self.get_paginated_response(product_list)
         return Response(product_list, status=status.HTTP_200_OK)
 
-    def get_product_data(self, product):
+    def get_product_data(self, card):
         """
         Build and return product data dictionary.
         """
-        product_image = next(iter(product.product_images.all()), None)
         username = self.request.query_params.get('username')
-        is_wishlisted = (product.product_wishlist
-                 .filter(user__username=username, deleted=False)
-                 .exists() if username else False)
+        is_wishlisted = (card.product_id in get_wishlisted_products(self.request, username=username)
+                         if username else False)
         return {
-            'id': product.id,
-            'name': product.name,
-            'brand': product.brand.name if product.brand else '',
-            'brand_id': product.brand.id if product.brand else '',
-            'price': product.price,
-            'selling_price': product.selling_price,
-            'image': product_image.image.url if product_image and product_image.image else '',
-            'rating': product.rating or '',
-            'variants': product.get_distinct_variant_attributes(),
+            'id': card.product_id,
+            'name': card.name,
+            'brand': card.brand_name or '',
+            'brand_id': card.brand_id or '',
+            'price': card.price,
+            'selling_price': card.selling_price,
+            'image': card.image.url if card.image else '',
+            'rating': card.rating or '',
+            'variants': card.variants,
             'is_wishlisted': is_wishlisted,
         }
 
@@ -180,13 +245,14 @@ class CustomerLookBookViewSet(GenericViewSet, ListModelMixin):
     permission_classes = (AllowAny,)
     queryset = Products.objects.all()
     serializer_class = ProductsModelSerializerGET
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_class = CustomerProductFilter
     search_fields = ['name', 'brand__name']
+    search_vector_field = 'search_vector'
 
 
 @extend_schema(tags=["Customer"])
-class CustomerVariantViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin):
+class CustomerVariantViewSet(ResponseCacheMixin, SparseFieldsMixin, GenericViewSet, ListModelMixin, RetrieveModelMixin):
     """
         Get the list of variant products.
 
@@ -198,11 +264,16 @@ class CustomerVariantViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin)
     """
     authentication_classes = [SessionAuthentication]
     permission_classes = (AllowAny,)
-    queryset = Variant.objects.filter(product__deleted=False)
+    queryset = Variant.objects.filter(product__deleted=False).select_related(
+        'product__brand', 'product__gst', 'product__dimension', 'created_by', 'updated_by'
+    ).prefetch_related(
+        'variant__attributes', 'variant_images', 'product__categories', 'product__product_images'
+    )
     serializer_class = VariantModelSerializerGET
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_class = CustomerVariantFilter
     search_fields = ['product__name', 'product__brand', 'product__tags']
+    conditional_models = (Variant, VariantAttributes, Attribute) + PRODUCT_MODELS
 
     @action(detail=True, methods=['GET'], url_path='other-variants')
     def other_variants(self, request, *args, **kwargs):
@@ -217,7 +288,7 @@ class CustomerVariantViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin)
 
 
 @extend_schema(tags=["Customer"])
-class CustomerCategoryViewSet(GenericViewSet, ListModelMixin):
+class CustomerCategoryViewSet(ResponseCacheMixin, SparseFieldsMixin, GenericViewSet, ListModelMixin):
     """
         Get the list of categories.
 
@@ -234,10 +305,71 @@ class CustomerCategoryViewSet(GenericViewSet, ListModelMixin):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_class = CustomerCategoryFilter
     search_fields = ['name', 'tags', 'handle']
+    conditional_models = (Category, AttributeGroup, Attribute)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            # Sub categories of every level from one query, instead of one query per category
+            children = defaultdict(list)
+            categories = Category.objects.select_related(
+                'attribute_group', 'parent_category', 'created_by', 'updated_by'
+            ).prefetch_related('attribute_group__attributes').order_by('name')
+            for category in categories:
+                children[category.parent_category_id].append(category)
+            context['category_children'] = children
+        return context
+
+    @action(detail=False, methods=['GET'], url_path='tree')
+    def tree(self, request, *args, **kwargs):
+        """
+            API to fetch the whole active category tree for the menu.
+
+            Parameters:
+                request (HttpRequest): The HTTP request object, honours If-None-Match.
+
+            Returns:
+                HttpResponse: The category tree as JSON, or 304 when the ETag still matches.
+        """
+        etag, blob = get_category_tree()
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(blob, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+
+class HomeSnapshotMixin:
+    """
+        `home` action serving the home page rows of the viewset from the home snapshot.
+    """
+    home_section = None
+
+    @action(detail=False, methods=['GET'], url_path='home')
+    def home(self, request, *args, **kwargs):
+        """
+            API to fetch the rows shown on the home page, from the precomputed snapshot.
+
+            Parameters:
+                request (HttpRequest): The HTTP request object, honours If-None-Match.
+
+            Returns:
+                HttpResponse: The rows as JSON, or 304 when the ETag still matches.
+        """
+        etag, blob = get_home_section(request, self.home_section)
+        if etag and etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(blob, content_type='application/json')
+        if etag:
+            response['ETag'] = etag
+        return response
 
 
 @extend_schema(tags=["Customer"])
-class CustomerCollectionViewSet(GenericViewSet, ListModelMixin):
+class CustomerCollectionViewSet(HomeSnapshotMixin, ResponseCacheMixin, PrefetchPlanMixin, SparseFieldsMixin, GenericViewSet,
+                                ListModelMixin):
     """
         Get the list of collection.
 
@@ -254,10 +386,13 @@ class CustomerCollectionViewSet(GenericViewSet, ListModelMixin):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_class = CustomerCollectionFilter
     search_fields = ['name', 'tags', 'description']
+    conditional_models = (Collection, CollectionItems) + PRODUCT_MODELS
+    home_section = 'collections'
 
 
 @extend_schema(tags=["Customer"])
-class CustomerLookBookViewSet(GenericViewSet, ListModelMixin):
+class CustomerLookBookViewSet(HomeSnapshotMixin, ResponseCacheMixin, PrefetchPlanMixin, SparseFieldsMixin, GenericViewSet,
+                              ListModelMixin):
     """
         Get the list of look book.
 
@@ -274,10 +409,12 @@ class CustomerLookBookViewSet(GenericViewSet, ListModelMixin):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_class = CustomerLookBookFilter
     search_fields = ['name']
+    conditional_models = (LookBook, LookBookItems) + PRODUCT_MODELS
+    home_section = 'look_books'
 
 
 @extend_schema(tags=["Customer"])
-class CustomerOrderViewSet(GenericViewSet, ListModelMixin):
+class CustomerOrderViewSet(SparseFieldsMixin, GenericViewSet, ListModelMixin):
     """
         Get the list of Orders.
 
@@ -299,7 +436,7 @@ class CustomerOrderViewSet(GenericViewSet, ListModelMixin):
 
 
 @extend_schema(tags=["Customer"])
-class CustomerBrandViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin):
+class CustomerBrandViewSet(ResponseCacheMixin, SparseFieldsMixin, GenericViewSet, ListModelMixin, RetrieveModelMixin):
     """
     Get the list of brands.
      Parameters:
@@ -100,6 +100,7 @@ class ManageCustomerReturn(GenericViewSet, ListModelMixin, RetrieveModelMixin, E
     permission_classes = (IsAuthenticated, IsSuperUser,)
     queryset = Return.objects.all().order_by('-id')
     serializer_class = ReturnModelSerializerGET
+    background_export = True
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_class = CustomerReturnFilter
     search_fields = ['reason__title', 'product__product__name', 'refund_method', 'status', 'refund_status']
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import action
@@ -7,7 +8,7 @@ from rest_framework.authentication import SessionAuthentication
 from drf_spectacular.utils import extend_schema
 
 from customer.models import Cart
-from product.models import Variant
+from customer.utils import reserve_stock
 
 from customer.serializers import CartModelSerializer
 from customer.serializers import UpdateCartProductSerializer
@@ -90,9 +91,10 @@ class SessionCartModelViewSet(GenericViewSet):
         cart_item = cart.cartitems.get(
             cart=cart, product_variant=product_variant
         )
-        cart_item.quantity += quantity
-        cart_item.save()
-        Variant.objects.get(pk=product_variant).update_stock(quantity)
+        with transaction.atomic():
+            cart_item.quantity += quantity
+            cart_item.save()
+            reserve_stock(product_variant, quantity)
 
         return Response({
             'data': serializer.data,
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework_simplejwt'
@@ -549,10 +550,31 @@ AWS_QUERYSTRING_AUTH = True # Optional: Makes media URLs public without signed U
 STATICFILES_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
 # Media files storage
-DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+DEFAULT_FILE_STORAGE = 'setup.storage.CachedUrlS3Storage'
 
 # AWS_LOCATION = 'media'  # E.g., "media" or "static"
 AWS_S3_FILE_OVERWRITE = False  # To prevent overwriting files with the same name
 
 SHIP_ROCKET_EMAIL = os.getenv('SHIP_ROCKET_EMAIL')
 SHIP_ROCKET_PASSWORD = os.getenv('SHIP_ROCKET_PASSWORD')
+
+# Caches
+# `default` is local to each worker process, `shared` is seen by every worker and holds the cache versions
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+if os.getenv('REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
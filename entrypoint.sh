@@ -12,6 +12,21 @@ python manage.py collectstatic --noinput
 
 echo "Applying migrations..."
 python manage.py migrate --noinput
+python manage.py createcachetable
+
+echo "Building category closure..."
+python manage.py rebuild_category_closure
+
+echo "Building product cards..."
+python manage.py rebuild_variant_facets
+python manage.py rebuild_product_cards
+python manage.py rebuild_search_vectors
+
+echo "Generating missing image renditions in the background..."
+python manage.py generate_renditions &
+
+echo "Starting the export worker..."
+python manage.py run_export_worker &
 
 
 
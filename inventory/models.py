@@ -5,6 +5,8 @@ from users.models.base_model import BaseModel
 
 
 class Tax(BaseModel):
+    cache_versioned = True
+
     name = models.CharField(max_length=25, blank=True, null=True, verbose_name='Name')
     slab = models.CharField(max_length=25, blank=True, null=True, verbose_name='Slab')
 
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from masterdata.models import CategoryClosure
+
+
+class Command(BaseCommand):
+    help = 'To rebuild the category closure table from the parent categories'
+
+    def handle(self, *args, **options):
+        count = CategoryClosure.rebuild()
+        self.stdout.write(f'Rebuilt the category closure with {count} links.')
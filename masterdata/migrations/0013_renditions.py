@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masterdata', '0012_categoryclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Renditions'),
+        ),
+    ]
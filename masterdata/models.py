@@ -1,7 +1,9 @@
 from django.db import models
+from django.db import transaction
 from users.models.base_model import BaseModel
 from django.contrib.auth import get_user_model
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 
 User = get_user_model()
 
@@ -14,6 +16,8 @@ class Tag(BaseModel):
 
 
 class Attribute(BaseModel):
+    cache_versioned = True
+
     name = models.CharField(max_length=80, null=True, verbose_name='Name')
     value = ArrayField(models.CharField(max_length=100), blank=True, null=True, default=list, verbose_name='Values')
     # value = models.JSONField(default=list, null=True, verbose_name='Values')
@@ -23,6 +27,8 @@ class Attribute(BaseModel):
 
 
 class Dimension(BaseModel):
+    cache_versioned = True
+
     DIMENSION_UNIT = (
         ('mm', 'mm'),
         ('cm', 'cm'),
@@ -52,12 +58,20 @@ class Dimension(BaseModel):
 
 
 class Brand(BaseModel):
+    cache_versioned = True
+
     name = models.CharField(max_length=75, blank=True, null=True, verbose_name='Name', db_index=True)
     logo = models.FileField(upload_to='brand/', blank=True, null=True, verbose_name='Image')
+    renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Renditions')
     # description = models.TextField(blank=True, null=True, verbose_name='Description')
     is_active = models.BooleanField(default=True, verbose_name='Active')
     tags = ArrayField(models.CharField(max_length=100, blank=True, null=True), blank=True, null=True, default=list, verbose_name='Tags')
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='brand_name_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -71,6 +85,8 @@ class Brand(BaseModel):
 
 
 class AttributeGroup(BaseModel):
+    cache_versioned = True
+
     name = models.CharField(max_length=75, null=True, verbose_name='Name')
     attributes = models.ManyToManyField(Attribute, related_name='attributeitems', null=True, verbose_name='Attributes')
 
@@ -79,6 +95,8 @@ class AttributeGroup(BaseModel):
 
 
 class Category(BaseModel):
+    cache_versioned = True
+
     name = models.CharField(max_length=75, blank=True, null=True, verbose_name='Name', db_index=True)
     description = models.TextField(blank=True, null=True, verbose_name='Description')
     handle = models.CharField(max_length=75, blank=True, null=True)
@@ -101,6 +119,11 @@ class Category(BaseModel):
 
     tags = ArrayField(models.CharField(max_length=100, blank=True, null=True), blank=True, null=True, default=list, verbose_name='Tags')
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='category_name_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -113,7 +136,89 @@ class Category(BaseModel):
         self.save()
 
 
+class CategoryClosure(models.Model):
+    """
+        Every (ancestor, descendant) pair of the category tree, each category being
+        its own ancestor at depth 0. Kept in sync with `parent_category` by the signals.
+    """
+    # Both columns lead one of the composite indexes below
+    ancestor = models.ForeignKey(Category, related_name='descendant_links', on_delete=models.CASCADE,
+                                 db_index=False, verbose_name='Ancestor')
+    descendant = models.ForeignKey(Category, related_name='ancestor_links', on_delete=models.CASCADE,
+                                   db_index=False, verbose_name='Descendant')
+    depth = models.PositiveIntegerField(default=0, verbose_name='Depth')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='category_closure_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor'], name='category_closure_desc_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.ancestor_id} > {self.descendant_id} ({self.depth})'
+
+    @classmethod
+    def is_descendant(cls, category_id, ancestor_id):
+        return cls.objects.filter(ancestor_id=ancestor_id, descendant_id=category_id).exists()
+
+    @classmethod
+    def sync(cls, category):
+        """
+            Relink a category and its sub categories below the current parent category.
+            Nothing is written when the stored parent is already the current one.
+        """
+        parent_id = category.parent_category_id
+        stored = dict(cls.objects.filter(descendant=category, depth__lte=2).values_list('depth', 'ancestor_id'))
+        if 0 in stored and (stored.get(1) == parent_id if parent_id else set(stored) == {0}):
+            return
+
+        with transaction.atomic():
+            subtree = dict(cls.objects.filter(ancestor=category).values_list('descendant_id', 'depth'))
+            subtree[category.pk] = 0
+            if parent_id in subtree:
+                raise ValueError(f'Category {parent_id} is a sub category of {category.pk}')
+
+            # Detach the sub tree from its old ancestors
+            cls.objects.filter(descendant_id__in=subtree).exclude(ancestor_id__in=subtree).delete()
+
+            ancestors = []
+            if parent_id:
+                ancestors = cls.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth')
+                if not ancestors.exists():
+                    cls.sync(category.parent_category)
+
+            cls.objects.bulk_create([
+                cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth + distance + 1)
+                for descendant_id, depth in subtree.items()
+                for ancestor_id, distance in ancestors
+            ] + [cls(ancestor_id=category.pk, descendant_id=category.pk, depth=0)], ignore_conflicts=True)
+
+    @classmethod
+    def rebuild(cls):
+        """
+            Rebuild the whole table from the parent categories.
+        """
+        parents = dict(Category._base_manager.values_list('pk', 'parent_category_id'))
+
+        links = []
+        for category_id in parents:
+            ancestor_id, depth, seen = category_id, 0, set()
+            while ancestor_id and ancestor_id not in seen:
+                links.append(cls(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+                seen.add(ancestor_id)
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(links, batch_size=1000)
+        return len(links)
+
+
 class ReturnReason(BaseModel):
+    cache_versioned = True
+
     title = models.CharField(max_length=512, null=True, verbose_name='Reason')
     description = models.TextField(blank=True, null=True, verbose_name='Description')
 
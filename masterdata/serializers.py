@@ -1,6 +1,10 @@
 from rest_framework import serializers
 
+from setup.serializer import ReferenceRelatedField
+from setup.serializer import ReferenceListSerializer
+from setup.serializer import RenditionsField
 from .models import Category
+from .models import CategoryClosure
 from .models import Brand
 # from .models import Tag
 from .models import Attribute
@@ -27,6 +31,7 @@ class BrandModelSerializer(serializers.ModelSerializer):
             'deleted',
             'deleted_at',
             'deleted_by',
+            'renditions',
         )
     
     def validate(self, attrs):
@@ -50,9 +55,14 @@ class BrandModelSerializer(serializers.ModelSerializer):
 
 class BrandModelSerializerGET(serializers.ModelSerializer):
     logo = serializers.SerializerMethodField()
+    renditions = RenditionsField()
     created_by = serializers.SerializerMethodField()
     updated_by = serializers.SerializerMethodField()
 
+    prefetch_plan = {
+        'select_related': ('created_by', 'updated_by'),
+    }
+
     def get_created_by(self, attrs):
         return str(attrs.created_by if attrs.created_by else '')
 
@@ -113,6 +123,7 @@ class RetrieveAttributeModelSerializer(serializers.ModelSerializer):
 
 
 class AttributeGroupModelSerializer(serializers.ModelSerializer):
+    serializer_related_field = ReferenceRelatedField
     name = serializers.CharField()
 
     def validate(self, attrs):
@@ -204,6 +215,7 @@ class RetrieveDimensionModelSerializer(serializers.ModelSerializer):
 
 
 class CategoryModelSerializer(serializers.ModelSerializer):
+    serializer_related_field = ReferenceRelatedField
     name = serializers.CharField()
     description = serializers.CharField()
     image = serializers.FileField(required=False)
@@ -238,6 +250,12 @@ class CategoryModelSerializer(serializers.ModelSerializer):
                         'name': 'Handle is already in use.'
                     })
 
+            parent_category = attrs.get('parent_category')
+            if parent_category and CategoryClosure.is_descendant(parent_category.pk, self.instance.pk):
+                raise serializers.ValidationError({
+                    'parent_category': 'A category cannot be moved below itself or its sub categories.'
+                })
+
         return attrs
 
     class Meta:
@@ -278,11 +296,14 @@ class CategoryModelSerializerGET(serializers.ModelSerializer):
 
 
     def get_sub_category(self, attrs):
-        return CategoryModelSerializerGET(attrs.subcategory.all(), many=True).data
+        children = self.context.get('category_children')
+        sub_categories = children.get(attrs.pk, []) if children is not None else attrs.subcategory.all()
+        return CategoryModelSerializerGET(sub_categories, many=True, context=self.context).data
 
     class Meta:
         model = Category
         fields = '__all__'
+        list_serializer_class = ReferenceListSerializer
 
 
 class CategoryGET(serializers.ModelSerializer):
@@ -299,6 +320,7 @@ class CategoryGET(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
+        list_serializer_class = ReferenceListSerializer
 
 
 class ReturnReasonModelSerializer(serializers.ModelSerializer):
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from masterdata.models import Category
+from masterdata.models import CategoryClosure
+from masterdata.models import AttributeGroup
+from setup.cache import bump_version
+from setup.cache import bump_model_version
+
+
+@receiver(post_save, sender=Category)
+def category_closure_save(sender, instance, **kwargs):
+    CategoryClosure.sync(instance)
+
+
+@receiver(pre_delete, sender=Category)
+def category_closure_pre_delete(sender, instance, **kwargs):
+    # The children are detached with a queryset update, which sends no signal
+    instance._closure_children = list(
+        Category._base_manager.filter(parent_category=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Category)
+def category_closure_delete(sender, instance, **kwargs):
+    for child in Category._base_manager.filter(pk__in=getattr(instance, '_closure_children', [])):
+        CategoryClosure.sync(child)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_version_bump(sender, instance, **kwargs):
+    bump_version('category')
+
+
+@receiver(m2m_changed, sender=AttributeGroup.attributes.through)
+def attribute_group_attributes_change(sender, **kwargs):
+    bump_model_version(AttributeGroup)
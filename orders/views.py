@@ -150,6 +150,8 @@ class OrderModelViewSet(GenericViewSet, ListModelMixin, ExportData):
     permission_classes = (IsAuthenticated, IsSuperUser,)
     queryset = Order.objects.all().order_by('-id')
     serializer_class = OrderRetrieveSerializer
+    count_strategy = 'estimated'
+    background_export = True
     default_fields = [
         'order_id', 'total_amount', 'user', 'address',
         'status', 'payment_id', 'shipping_id'
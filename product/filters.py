@@ -1,5 +1,8 @@
 import django_filters as filters
-from django.db.models import Q
+from django.db.models import Exists
+from django.db.models import OuterRef
+
+from masterdata.models import CategoryClosure
 
 from product.models import Products
 from product.models import Variant
@@ -10,25 +13,42 @@ from product.models import LookBook
 from product.models import LookBookItems
 
 
+def in_categories(category_ids, product_ref='pk'):
+    """
+        EXISTS condition matching the products of any of the categories or of their sub categories
+        at any depth, without joining rows into the filtered queryset.
+
+        :param category_ids: The category ids.
+        :param product_ref: Path to the product id from the filtered model.
+    """
+    return Exists(
+        Products.categories.through.objects.filter(
+            products_id=OuterRef(product_ref),
+            category_id__in=CategoryClosure.objects.filter(ancestor_id__in=category_ids).values('descendant_id'),
+        )
+    )
+
+
 class ProductFilter(filters.FilterSet):
     categories = filters.CharFilter(method='generate_categories_view')
+    in_stock = filters.BooleanFilter(method='generate_in_stock_view')
 
     def generate_categories_view(self, queryset, value, *args, **kwargs):
         try:
             elements = args[0].split(',')
             categories_value = [int(num) for num in elements]
             if categories_value:
-                queryset = queryset.filter(
-                    Q(categories__in=categories_value) |
-                    Q(categories__parent_category__in=categories_value)
-                )
+                queryset = queryset.filter(in_categories(categories_value))
         except Exception as e:
             print('Exception occurred at the product section filter : ', str(e))
         return queryset
 
+    def generate_in_stock_view(self, queryset, name, value):
+        return queryset.filter(total_stock__gt=0) if value else queryset.filter(total_stock__lte=0)
+
     class Meta:
         model = Products
-        fields = ['condition', 'categories', 'brand', 'is_disabled']
+        fields = ['condition', 'categories', 'brand', 'is_disabled', 'in_stock']
 
 
 class VariantFilter(filters.FilterSet):
@@ -39,10 +59,7 @@ class VariantFilter(filters.FilterSet):
             elements = args[0].split(',')
             categories_value = [int(num) for num in elements]
             if categories_value:
-                queryset = queryset.filter(
-                    Q(product__categories__in=categories_value) |
-                    Q(product__categories__parent_category__in=categories_value)
-                )
+                queryset = queryset.filter(in_categories(categories_value, 'product_id'))
         except Exception as e:
             print('Exception occurred at the variant section filter : ', str(e))
         return queryset
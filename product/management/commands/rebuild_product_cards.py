@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from product.models import Products
+from product.models import ProductCard
+
+
+class Command(BaseCommand):
+    help = 'To build the storefront product cards, only the missing ones unless --all is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild the card of every product')
+
+    def handle(self, *args, **options):
+        products = Products.objects.all()
+        if not options['all']:
+            products = products.filter(card__isnull=True)
+
+        count = 0
+        for product_id in products.values_list('pk', flat=True).iterator():
+            ProductCard.refresh(product_id)
+            count += 1
+
+        # Cards of products that are no longer listed
+        stale, _ = ProductCard.objects.exclude(product__in=Products.objects.all()).delete()
+
+        self.stdout.write(f'Built {count} product cards, removed {stale} stale cards.')
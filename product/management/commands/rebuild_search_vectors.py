@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from product.models import Products
+
+
+class Command(BaseCommand):
+    help = 'To rebuild the stored product search vectors, only the products missing one unless --all is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild the search vector of every product')
+
+    def handle(self, *args, **options):
+        filters = {} if options['all'] else {'search_vector__isnull': True}
+        count = Products._base_manager.filter(**filters).count()
+        Products.refresh_search_vector(**filters)
+
+        self.stdout.write(f'Rebuilt the search vectors of {count} products.')
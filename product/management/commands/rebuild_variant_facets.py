@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from product.models import Products
+from product.signals import refresh_variant_facets
+
+
+class Command(BaseCommand):
+    help = 'To rebuild the stored variant facets, only the products missing them unless --all is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild the facets of every product')
+
+    def handle(self, *args, **options):
+        products = Products.objects.all()
+        if not options['all']:
+            products = products.filter(variant_prices=[], product_variant__deleted=False)
+
+        count = 0
+        for product_id in products.order_by().values_list('pk', flat=True).distinct().iterator():
+            refresh_variant_facets(product_id)
+            count += 1
+
+        self.stdout.write(f'Rebuilt the variant facets of {count} products.')
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.4 on 2026-10-18 16:32
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masterdata', '0010_dimension_name'),
+        ('product', '0026_remove_products_is_wishlisted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='product.products', verbose_name='Product')),
+                ('name', models.CharField(max_length=50, verbose_name='Name')),
+                ('brand_name', models.CharField(blank=True, max_length=75, null=True, verbose_name='Brand Name')),
+                ('image', models.FileField(blank=True, null=True, upload_to='product_images/', verbose_name='Image')),
+                ('price', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Price')),
+                ('selling_price', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Selling Price')),
+                ('rating', models.CharField(blank=True, max_length=120, null=True, verbose_name='Rating')),
+                ('total_stock', models.IntegerField(default=0, verbose_name='Total Stock')),
+                ('variant_count', models.IntegerField(default=0, verbose_name='No. of Variants')),
+                ('variants', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Variant Attributes')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('brand', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='masterdata.brand', verbose_name='Brand')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['variant_count', 'product'], name='product_card_listing_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.4 on 2026-10-18 16:33
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0027_productcard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='variant_attributes',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Variant Attributes'),
+        ),
+        migrations.AddField(
+            model_name='products',
+            name='variant_prices',
+            field=models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Variant Prices'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.4 on 2026-10-18 17:05
+
+import django.contrib.postgres.indexes
+import product.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masterdata', '0011_trigram_indexes'),
+        ('product', '0029_products_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION product_tags_text(varchar[]) RETURNS text
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE
+                AS $$ SELECT array_to_string($1, ' ') $$;
+            """,
+            reverse_sql='DROP FUNCTION IF EXISTS product_tags_text(varchar[]);',
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(product.models.TagsText('tags'), name='gin_trgm_ops'), name='product_tags_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.4 on 2026-10-18 16:50
+
+from django.db import migrations, models
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_total_stock(apps, schema_editor):
+    Products = apps.get_model('product', 'Products')
+    Variant = apps.get_model('product', 'Variant')
+
+    stock = Variant.objects.filter(product=OuterRef('pk'), deleted=False).order_by().values('product') \
+        .annotate(total=Sum('stock')).values('total')
+    Products.objects.update(total_stock=Coalesce(Subquery(stock), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0030_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='total_stock',
+            field=models.IntegerField(db_index=True, default=0, editable=False, verbose_name='Total Stock'),
+        ),
+        migrations.RunPython(fill_total_stock, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,22 @@
 from django.db import models
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Func
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import TextField
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from masterdata.models import Category, Brand, Dimension
 from users.models.base_model import BaseModel
 from masterdata.models import Attribute
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import OpClass
+from django.contrib.postgres.search import SearchVector
+from django.contrib.postgres.search import SearchVectorField
 from .manager import ProductsManager
 from .manager import VariantManager
 from .manager import VariantAttributesManager
@@ -11,12 +25,24 @@ from .manager import CollectionItemsManager
 from .manager import LooBookItemsManager
 
 from setup.utils import generate_presigned_url
+from setup.cache import bump_model_version
 # from inventory.models import Tax
 
 from customer.models import WishList
 
 
+class TagsText(Func):
+    """
+        Tags as one space separated string.
+        `product_tags_text` is an IMMUTABLE wrapper of array_to_string, so the expression can be indexed.
+    """
+    function = 'product_tags_text'
+    output_field = TextField()
+
+
 class Products(BaseModel):
+    cache_versioned = True
+
     PREFERRED_GENDER = (
         ('Men', 'Men'),
         ('Women', 'Women'),
@@ -59,11 +85,38 @@ class Products(BaseModel):
     no_of_reviews = models.IntegerField(verbose_name='No. of Reviews', blank=True, null=True)
     preferred_gender = models.CharField(choices=PREFERRED_GENDER, max_length=50, blank=True, null=False)
 
+    variant_attributes = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder,
+                                          verbose_name='Variant Attributes')
+    variant_prices = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder,
+                                      verbose_name='Variant Prices')
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name='Search Vector')
+    total_stock = models.IntegerField(default=0, editable=False, db_index=True, verbose_name='Total Stock')
+
     objects = ProductsManager()
 
+    # Maintained with queryset updates, a stale instance must never write them back
+    DENORMALIZED_FIELDS = ('variant_attributes', 'variant_prices', 'search_vector', 'total_stock')
+
+    SEARCH_CONFIG = getattr(settings, 'PRODUCT_SEARCH_CONFIG', 'english')
+
+    class Meta(BaseModel.Meta):
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='product_name_trgm_idx'),
+            GinIndex(OpClass(TagsText('tags'), name='gin_trgm_ops'), name='product_tags_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def disable(self):
         self.is_disabled = False
         self.save()
@@ -77,20 +130,86 @@ class Products(BaseModel):
         return product_image.image.url if product_image.image else ''
 
     def get_distinct_variant_attributes(self):
+        """
+            Distinct selling prices and attribute values of the product variants,
+            read from the facets stored by `refresh_variant_facets`.
+        """
+        if not self.variant_prices:
+            return {}
+        return {'selling_price': self.variant_prices, **self.variant_attributes}
+
+    @classmethod
+    def refresh_variant_facets(cls, product_id):
+        """
+            Recompute the stored variant facets and stock total of a single product.
+        """
         from collections import defaultdict
 
-        product_variants = Variant.objects.filter(product=self).prefetch_related('variant__attributes')
+        attributes = VariantAttributes.objects.filter(
+            variant__product_id=product_id
+        ).order_by().values_list('attributes__name', 'value').distinct()
+
         attributes_categorized = defaultdict(set)
+        for name, value in attributes:
+            attributes_categorized[name].add(value)
+
+        prices = Variant.objects.filter(product_id=product_id).order_by().values_list(
+            'selling_price', flat=True
+        ).distinct()
+
+        total_stock = Variant.objects.filter(product_id=product_id).aggregate(total=Sum('stock'))['total']
+
+        # Update without save() so the audit fields and product signals are left alone
+        cls._base_manager.filter(pk=product_id).update(
+            variant_attributes={key: sorted(values) for key, values in attributes_categorized.items()},
+            # Numbers, a JSON field would store Decimals as strings and the payloads render numbers
+            variant_prices=[float(price) for price in sorted(prices)],
+            total_stock=total_stock or 0,
+        )
+        bump_model_version(cls)
+
+    @classmethod
+    def adjust_stock(cls, product_id, quantity):
+        """
+            Add `quantity` (negative to take out) to the stock total of the product and its card.
+        """
+        cls._base_manager.filter(pk=product_id).update(total_stock=F('total_stock') + quantity)
+        ProductCard.objects.filter(product_id=product_id).update(total_stock=F('total_stock') + quantity)
+        bump_model_version(cls)
+
+        # The home snapshot renders the stock as well. Imported here, the snapshot imports the models
+        from customer.home_snapshot import refresh_home_snapshot
+        transaction.on_commit(lambda: refresh_home_snapshot([product_id]))
 
-        for variant in product_variants:
-            attributes_categorized['selling_price'].add(variant.selling_price)
-            for attr in variant.variant.all():
-                attributes_categorized[attr.attributes.name].add(attr.value)
+    @classmethod
+    def search_vector_expression(cls):
+        """
+            Weighted document of a product: name, then brand and tags, then the descriptions.
+        """
+        brand_name = Subquery(Brand._base_manager.filter(pk=OuterRef('brand_id')).values('name')[:1])
+        tags = TagsText('tags')
+
+        return (
+            SearchVector('name', weight='A', config=cls.SEARCH_CONFIG)
+            + SearchVector(brand_name, weight='B', config=cls.SEARCH_CONFIG)
+            + SearchVector(tags, weight='B', config=cls.SEARCH_CONFIG)
+            + SearchVector('short_description', weight='C', config=cls.SEARCH_CONFIG)
+            + SearchVector('description', weight='D', config=cls.SEARCH_CONFIG)
+        )
 
-        return {key: list(values) for key, values in attributes_categorized.items()}
+    @classmethod
+    def refresh_search_vector(cls, **filters):
+        """
+            Recompute the stored search vector of the products matching `filters`.
+        """
+        # Update without save() so the audit fields and product signals are left alone
+        cls._base_manager.filter(**filters).update(search_vector=cls.search_vector_expression())
+        bump_model_version(cls)
 
 
 class Variant(BaseModel):
+    cache_versioned = True
+
     product = models.ForeignKey(
         Products, related_name='product_variant',
         on_delete=models.CASCADE, verbose_name='Variant'
@@ -104,15 +223,25 @@ class Variant(BaseModel):
         return f"{self.product.name}"
 
     def restore_stock(self, quantity):
-        updated_stock = self.stock + quantity
-        self.stock = updated_stock
-        self.save()
+        self.update_stock(-quantity)
 
     def update_stock(self, quantity):
-        self.stock -= quantity  # Subtract when positive, add when negative
-        if self.stock < 0:
-            raise ValueError("Stock cannot be negative.")
-        self.save()
+        """
+            Take `quantity` out of the stock, a negative quantity puts it back.
+
+            The variant, product and card stocks change with UPDATE ... SET stock = stock - n
+            in one transaction, so concurrent carts cannot overwrite each other's change.
+            The stock totals only count live variants of live products, the stock of a
+            deleted variant (eg: restored from an old order) is left out of them.
+        """
+        with transaction.atomic():
+            # Subtract when positive, add when negative
+            stock = {'stock': F('stock') - quantity}
+            if Variant.objects.filter(pk=self.pk, stock__gte=quantity).update(**stock):
+                Products.adjust_stock(self.product_id, -quantity)
+            elif not Variant._base_manager.filter(pk=self.pk, stock__gte=quantity).update(**stock):
+                raise ValueError("Stock cannot be negative.")
+        self.refresh_from_db(fields=['stock'])
 
     @classmethod
     def get_stock(cls, variant):
@@ -120,6 +249,8 @@ class Variant(BaseModel):
 
 
 class VariantAttributes(BaseModel):
+    cache_versioned = True
+
     variant = models.ForeignKey(
         Variant, related_name='variant',
         on_delete=models.CASCADE, verbose_name='Variant'
@@ -136,6 +267,8 @@ class VariantAttributes(BaseModel):
 
 
 class ProductImage(BaseModel):
+    cache_versioned = True
+
     product = models.ForeignKey(
         Products, related_name='product_images', verbose_name='Product Image',
         on_delete=models.SET_NULL, null=True, blank=True
@@ -153,6 +286,7 @@ class ProductImage(BaseModel):
                                   verbose_name='Thumbnail')
     alt_text = models.CharField(max_length=255, verbose_name='Alt Text')
     name = models.CharField(max_length=250, blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Renditions')
 
     objects = ProductImageManager()
 
@@ -161,10 +295,13 @@ class ProductImage(BaseModel):
 
 
 class Collection(BaseModel):
+    cache_versioned = True
+
     name = models.CharField(max_length=100, verbose_name='Name')
 
     description = models.TextField(verbose_name='Description', blank=True, null=True)
     feature_image = models.FileField(upload_to='collections/', blank=True, null=True, verbose_name='Image')
+    renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Renditions')
     tags = ArrayField(models.CharField(max_length=100, blank=True, null=True), blank=True, null=True, default=list,
                       verbose_name='Tags')
     is_in_home_page = models.BooleanField(default=False, verbose_name='Display In Home Page')
@@ -174,6 +311,8 @@ class Collection(BaseModel):
 
 
 class CollectionItems(BaseModel):
+    cache_versioned = True
+
     collection = models.ForeignKey(
         Collection, on_delete=models.CASCADE,
         related_name='collection_items', verbose_name='Collection'
@@ -188,9 +327,12 @@ class CollectionItems(BaseModel):
 
 
 class LookBook(BaseModel):
+    cache_versioned = True
+
     name = models.CharField(max_length=100, verbose_name='Name')
     description = models.TextField(verbose_name='Description', blank=True, null=True)
     feature_image = models.FileField(upload_to='lookbook/', blank=True, null=True, verbose_name='Image')
+    renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Renditions')
     tags = ArrayField(models.CharField(max_length=100, blank=True, null=True), blank=True, null=True, default=list,
                       verbose_name='Tags')
     is_in_home_page = models.BooleanField(default=False, verbose_name='Display In Home Page')
@@ -200,6 +342,8 @@ class LookBook(BaseModel):
 
 
 class LookBookItems(BaseModel):
+    cache_versioned = True
+
     look_book = models.ForeignKey(
         LookBook, on_delete=models.CASCADE,
         related_name='look_book_items', verbose_name='Look Book'
@@ -211,3 +355,69 @@ class LookBookItems(BaseModel):
     )
 
     objects = LooBookItemsManager()
+
+
+class ProductCard(models.Model):
+    """
+        Denormalized read model of a product for the storefront listing.
+        Rows are kept current by the signals in product/signals.py.
+    """
+    product = models.OneToOneField(
+        Products, primary_key=True, on_delete=models.CASCADE,
+        related_name='card', verbose_name='Product'
+    )
+    name = models.CharField(max_length=50, verbose_name='Name')
+    brand = models.ForeignKey(
+        Brand, related_name='+', on_delete=models.SET_NULL,
+        blank=True, null=True, verbose_name='Brand'
+    )
+    brand_name = models.CharField(max_length=75, blank=True, null=True, verbose_name='Brand Name')
+    image = models.FileField(upload_to='product_images/', blank=True, null=True, verbose_name='Image')
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Price')
+    selling_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Selling Price')
+    rating = models.CharField(max_length=120, blank=True, null=True, verbose_name='Rating')
+    total_stock = models.IntegerField(default=0, verbose_name='Total Stock')
+    variant_count = models.IntegerField(default=0, verbose_name='No. of Variants')
+    variants = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name='Variant Attributes')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Updated At')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['variant_count', 'product'], name='product_card_listing_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def refresh(cls, product_id):
+        """
+            Rebuild the card of a single product.
+            Products hidden by the default manager (deleted product or brand) lose their card.
+        """
+        product = Products.objects.select_related('brand').filter(pk=product_id).first()
+        if product is None:
+            cls.objects.filter(product_id=product_id).delete()
+            return None
+
+        variants = Variant.objects.filter(product=product).aggregate(
+            total_stock=Sum('stock'), variant_count=Count('id')
+        )
+        product_image = product.product_images.first()
+
+        card, created = cls.objects.update_or_create(
+            product=product,
+            defaults={
+                'name': product.name,
+                'brand': product.brand,
+                'brand_name': product.brand.name if product.brand else '',
+                'image': product_image.image.name if product_image and product_image.image else None,
+                'price': product.price,
+                'selling_price': product.selling_price,
+                'rating': product.rating,
+                'total_stock': variants['total_stock'] or 0,
+                'variant_count': variants['variant_count'] or 0,
+                'variants': product.get_distinct_variant_attributes(),
+            }
+        )
+        return card
@@ -1,5 +1,9 @@
+import itertools
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
-from django.db.models import Sum
 
 from product.models import Products
 from product.models import Variant
@@ -10,8 +14,11 @@ from product.models import CollectionItems
 from product.models import LookBook
 from product.models import LookBookItems
 from masterdata.models import Brand
+from masterdata.models import Category
+from masterdata.models import Attribute
 
 from customer.models import WishList
+from customer.utils import get_wishlisted_products
 
 from customer.serializers.serializers import ReviewSerializer
 from masterdata.serializers import CategoryGET
@@ -19,8 +26,22 @@ from masterdata.serializers import BrandModelSerializerGET
 from masterdata.serializers import RetrieveDimensionModelSerializer
 from masterdata.serializers import RetrieveAttributeModelSerializer
 from inventory.serializers import TaxModelSerializerGET
+from setup.serializer import ReferenceRelatedField
+from setup.serializer import ReferenceListSerializer
+from setup.serializer import RenditionsField
+from setup.uploads import uploaded_files
+from setup.bulk import BulkActionSerializer
+from setup.bulk import create_values
+from setup.cache import bump_model_version
+from setup.renditions import queue_renditions
+from setup.signals import post_bulk_update
+
+# Largest number of variants one matrix may create
+VARIANT_MATRIX_MAX_VARIANTS = getattr(settings, 'VARIANT_MATRIX_MAX_VARIANTS', 500)
+
 
 class ProductsModelSerializer(serializers.ModelSerializer):
+    serializer_related_field = ReferenceRelatedField
     short_description = serializers.CharField()
     sku = serializers.CharField()
     price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=1.00)
@@ -72,28 +93,29 @@ class ProductsModelSerializer(serializers.ModelSerializer):
             'deleted',
             'deleted_at',
             'deleted_by',
+            'variant_attributes',
+            'variant_prices',
+            'search_vector',
+            'total_stock',
         )
 
     def create(self, validated_data):
-        # from setup.utils import compress_image
         attachment = validated_data.pop('images', [])
 
         categories = validated_data.pop('categories', None)
 
-        product = Products.objects.create(**validated_data)
+        # The images are uploaded in parallel first, the rows are written once all of them are stored
+        with uploaded_files(ProductImage._meta.get_field('image'), attachment) as names:
+            product = Products.objects.create(**validated_data)
 
-        if categories:
-            product.categories.set(categories)
+            if categories:
+                product.categories.set(categories)
 
-        for file in attachment:
-        #     compressed_image = compress_image(file)
-
-            img_obj = product.product_images.create(**{
-                'image': file,
-                'name': file.name,
-            })
-        #     img_obj.thumbnail.save(f"thumbnail_{file.name}", compressed_image)
-            img_obj.save()
+            for file, name in zip(attachment, names):
+                product.product_images.create(**{
+                    'image': name,
+                    'name': file.name,
+                })
 
         return product
 
@@ -110,9 +132,24 @@ class ProductsModelSerializerGET(serializers.ModelSerializer):
     gst = TaxModelSerializerGET()
     is_wishlisted = serializers.SerializerMethodField()
 
+    # Model fields read by the method fields, used to narrow the queryset of sparse fieldsets
+    sparse_field_sources = {
+        'images': 'product_images',
+        'created_by': 'created_by',
+        'updated_by': 'updated_by',
+        'stock': 'total_stock',
+        'is_wishlisted': 'id',
+    }
+
+    # Relations read while rendering, joined or prefetched by PrefetchPlanMixin
+    prefetch_plan = {
+        'select_related': ('gst', 'dimension', 'created_by', 'updated_by'),
+        'prefetch_related': ('categories',),
+        'nested': {'brand': BrandModelSerializerGET, 'product_images': 'ProductImageModelSerializer'},
+    }
+
     def get_stock(self, attrs):
-        total_stock = attrs.product_variant.aggregate(total=Sum('stock'))['total']
-        return total_stock or 0 
+        return attrs.total_stock
 
     def get_created_by(self, attrs):
         return str(attrs.created_by if attrs.created_by else '')
@@ -124,22 +161,23 @@ class ProductsModelSerializerGET(serializers.ModelSerializer):
         return ProductImageModelSerializer(attrs.product_images.all(), many=True).data
 
     def get_is_wishlisted(self, attrs):
-        from setup.middleware.request import CurrentRequestMiddleware
-        request_ = CurrentRequestMiddleware.get_request()
-        user = request_.user if request_ else False
-        if user and user.is_authenticated:
-            return attrs.product_wishlist.filter(user=user, deleted=False).exists()
-        return False
+        # Payloads shared by every visitor are rendered without a wishlist
+        if self.context.get('shared'):
+            return False
+        return attrs.pk in get_wishlisted_products(self.context.get('request'))
 
     class Meta:
         model = Products
-        fields = '__all__'
+        exclude = ('search_vector',)
+        list_serializer_class = ReferenceListSerializer
 
 
 class BrandSerializerGET(serializers.ModelSerializer):
+   renditions = RenditionsField()
+
    class Meta:
        model = Brand
-       fields = ['id', 'name', 'logo']
+       fields = ['id', 'name', 'logo', 'renditions']
 
 
 class VariantModelSerializer(serializers.ModelSerializer):
@@ -152,27 +190,34 @@ class VariantModelSerializer(serializers.ModelSerializer):
     attributes = serializers.JSONField(required=True, write_only=True)
 
     def create(self, validated_data):
-        from setup.utils import compress_image
         attachment = validated_data.pop('images', [])
         attributes = validated_data.pop('attributes', None)
-        product = Variant.objects.create(**validated_data)
-
-        if attributes:
-            for i in attributes:
-                product.variant.create(**{
-                    'attributes_id': i['attribute'],
-                    'value': i['value'],
-                    'name': i['name']
-                })
-
-        for file in attachment:
-
-            img_obj = product.variant_images.create(**{
-                'image': file,
-                'name': file.name,
-            })
-            img_obj.save()
 
+        request = self.context.get('request')
+        user = request.user if request else None
+
+        # The images are uploaded in parallel first, the rows are written once all of them are stored
+        with uploaded_files(ProductImage._meta.get_field('image'), attachment) as names:
+            product = Variant.objects.create(**validated_data)
+
+            VariantAttributes.objects.bulk_create([
+                VariantAttributes(
+                    variant=product, attributes_id=i['attribute'], value=i['value'], name=i['name'],
+                    **create_values(VariantAttributes, user)
+                ) for i in attributes or []
+            ])
+            images = ProductImage.objects.bulk_create([
+                ProductImage(variant=product, image=name, name=file.name, **create_values(ProductImage, user))
+                for file, name in zip(attachment, names)
+            ])
+
+            # The facets and card of the product are refreshed with the attributes and images in place
+            transaction.on_commit(lambda: post_bulk_update.send(sender=Variant, pks=[product.pk]))
+            for image in images:
+                queue_renditions(ProductImage, image)
+
+        bump_model_version(VariantAttributes)
+        bump_model_version(ProductImage)
         return product
 
     class Meta:
@@ -193,6 +238,13 @@ class VariantModelSerializerGET(serializers.ModelSerializer):
     created_by = serializers.SerializerMethodField()
     updated_by = serializers.SerializerMethodField()
 
+    sparse_field_sources = {
+        'attributes': 'variant',
+        'images': 'variant_images',
+        'created_by': 'created_by',
+        'updated_by': 'updated_by',
+    }
+
     def get_created_by(self, attrs):
         return str(attrs.created_by if attrs.created_by else '')
 
@@ -224,13 +276,19 @@ class VariantAttributeModelSerializerGET(serializers.ModelSerializer):
     class Meta:
         model = VariantAttributes
         fields = '__all__'
+        list_serializer_class = ReferenceListSerializer
 
 
 class ProductImageModelSerializer(serializers.ModelSerializer):
     image = serializers.ImageField()
+    renditions = RenditionsField()
     created_by = serializers.SerializerMethodField()
     updated_by = serializers.SerializerMethodField()
 
+    prefetch_plan = {
+        'select_related': ('created_by', 'updated_by'),
+    }
+
     def get_created_by(self, attrs):
         return str(attrs.created_by if attrs.created_by else '')
 
@@ -274,15 +332,29 @@ class CollectionModelSerializer(serializers.ModelSerializer):
             'deleted',
             'deleted_at',
             'deleted_by',
+            'renditions',
         )
 
 
 class CollectionModelSerializerGET(serializers.ModelSerializer):
     feature_image = serializers.SerializerMethodField()
+    renditions = RenditionsField()
     collection_items = serializers.SerializerMethodField()
     created_by = serializers.SerializerMethodField()
     updated_by = serializers.SerializerMethodField()
 
+    sparse_field_sources = {
+        'collection_items': 'collection_items',
+        'feature_image': 'feature_image',
+        'created_by': 'created_by',
+        'updated_by': 'updated_by',
+    }
+
+    prefetch_plan = {
+        'select_related': ('created_by', 'updated_by'),
+        'nested': {'collection_items': 'CollectionItemsModelSerializerGET'},
+    }
+
     def get_created_by(self, attrs):
         return str(attrs.created_by if attrs.created_by else '')
 
@@ -290,7 +362,8 @@ class CollectionModelSerializerGET(serializers.ModelSerializer):
         return str(attrs.updated_by if attrs.updated_by else '')
 
     def get_collection_items(self, attrs):
-        return CollectionItemsModelSerializerGET(attrs.collection_items.all(), many=True).data
+        # The context reaches the products, eg: `shared` payloads carry no wishlist
+        return CollectionItemsModelSerializerGET(attrs.collection_items.all(), many=True, context=self.context).data
 
     def get_feature_image(self, attrs):
         return attrs.feature_image.url if attrs.feature_image else ''
@@ -335,9 +408,22 @@ class LookBookModelSerializer(serializers.ModelSerializer):
 class LookBookModelSerializerGET(serializers.ModelSerializer):
     look_book_items = serializers.SerializerMethodField()
     feature_image = serializers.SerializerMethodField()
+    renditions = RenditionsField()
     created_by = serializers.SerializerMethodField()
     updated_by = serializers.SerializerMethodField()
 
+    sparse_field_sources = {
+        'look_book_items': 'look_book_items',
+        'feature_image': 'feature_image',
+        'created_by': 'created_by',
+        'updated_by': 'updated_by',
+    }
+
+    prefetch_plan = {
+        'select_related': ('created_by', 'updated_by'),
+        'nested': {'look_book_items': 'LookBookItemsModelSerializerGET'},
+    }
+
     def get_created_by(self, attrs):
         return str(attrs.created_by if attrs.created_by else '')
 
@@ -348,7 +434,8 @@ class LookBookModelSerializerGET(serializers.ModelSerializer):
         return attrs.feature_image.url if attrs.feature_image else ''
 
     def get_look_book_items(self, attrs):
-        return LookBookItemsModelSerializerGET(attrs.look_book_items.all(), many=True).data
+        # The context reaches the products, eg: `shared` payloads carry no wishlist
+        return LookBookItemsModelSerializerGET(attrs.look_book_items.all(), many=True, context=self.context).data
 
     class Meta:
         model = LookBook
@@ -367,6 +454,166 @@ class AddToLookBookSerializer(serializers.Serializer):
     )
 
 
+class ProductBulkActionSerializer(BulkActionSerializer):
+    ACTIONS = ('enable', 'disable', 'delete', 'price', 'categories', 'add_to_collection')
+
+    action = serializers.ChoiceField(choices=ACTIONS)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=1.00, required=False)
+    selling_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=1.00, required=False)
+    # Percentage added to (or taken off when negative) the selling price
+    adjust_percent = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=-99, required=False)
+    categories = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), many=True, required=False)
+    category_mode = serializers.ChoiceField(choices=('add', 'replace', 'remove'), default='add')
+    collection = serializers.PrimaryKeyRelatedField(queryset=Collection.objects.all(), required=False)
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        action = attrs['action']
+        if action == 'price' and not any(key in attrs for key in ('price', 'selling_price', 'adjust_percent')):
+            raise serializers.ValidationError('Give the price, selling_price or adjust_percent.')
+        if action == 'price' and 'selling_price' in attrs and 'adjust_percent' in attrs:
+            raise serializers.ValidationError('Give either the selling_price or adjust_percent.')
+        if action == 'categories' and not attrs.get('categories'):
+            raise serializers.ValidationError({'categories': 'This field is required.'})
+        if action == 'add_to_collection' and not attrs.get('collection'):
+            raise serializers.ValidationError({'collection': 'This field is required.'})
+        return attrs
+
+
+class VariantBulkActionSerializer(BulkActionSerializer):
+    ACTIONS = ('delete', 'price', 'stock')
+
+    action = serializers.ChoiceField(choices=ACTIONS)
+    selling_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=1.00, required=False)
+    adjust_percent = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=-99, required=False)
+    stock = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        action = attrs['action']
+        if action == 'price' and ('selling_price' in attrs) == ('adjust_percent' in attrs):
+            raise serializers.ValidationError('Give either the selling_price or adjust_percent.')
+        if action == 'stock' and 'stock' not in attrs:
+            raise serializers.ValidationError({'stock': 'This field is required.'})
+        return attrs
+
+
+class VariantMatrixSerializer(serializers.Serializer):
+    """
+        The variants of a product made from every combination of the attribute values,
+        eg: sizes S, M, L by colours Red, Blue make six variants.
+    """
+    product = serializers.PrimaryKeyRelatedField(queryset=Products.objects.all())
+    # eg: [{"attribute": 1, "values": ["S", "M", "L"]}, {"attribute": 2, "values": ["Red", "Blue"]}]
+    attributes = serializers.JSONField()
+    stock = serializers.IntegerField(min_value=0, default=0)
+    selling_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=1.00)
+    # Shared by every variant, attached to the product once
+    images = serializers.ListField(
+        child=serializers.FileField(max_length=1000000, allow_empty_file=False, use_url=False),
+        write_only=True, required=False
+    )
+
+    def validate_attributes(self, value):
+        if not isinstance(value, list) or not value:
+            raise serializers.ValidationError('Give a list of {"attribute": id, "values": [...]}.')
+
+        matrix = []
+        for item in value:
+            if not isinstance(item, dict) or not isinstance(item.get('attribute'), int) \
+                    or not isinstance(item.get('values'), list):
+                raise serializers.ValidationError('Give a list of {"attribute": id, "values": [...]}.')
+            # Duplicates are dropped, the order is kept
+            values = list(dict.fromkeys(str(value).strip() for value in item['values'] if str(value).strip()))
+            if not values:
+                raise serializers.ValidationError(f'Give the values of the attribute {item["attribute"]}.')
+            matrix.append((item['attribute'], values))
+
+        ids = [attribute_id for attribute_id, _ in matrix]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError('An attribute is given more than once.')
+        attributes = Attribute.objects.in_bulk(ids)
+        missing = [str(attribute_id) for attribute_id in ids if attribute_id not in attributes]
+        if missing:
+            raise serializers.ValidationError(f'Attribute {", ".join(missing)} does not exist.')
+
+        count = 1
+        for _, values in matrix:
+            count *= len(values)
+        if count > VARIANT_MATRIX_MAX_VARIANTS:
+            raise serializers.ValidationError(
+                f'The attributes make {count} variants, at most {VARIANT_MATRIX_MAX_VARIANTS} are allowed.'
+            )
+        return [(attributes[attribute_id], values) for attribute_id, values in matrix]
+
+    def create(self, validated_data):
+        """
+            Create the variants the product has no variant for yet, with bulk inserts in one transaction.
+
+            :return: dict with the `product`, the created `variants` as (variant, combination)
+                     and the number of combinations `skipped` because they exist.
+        """
+        attachment = validated_data.get('images', [])
+        request = self.context.get('request')
+        user = request.user if request else None
+
+        with uploaded_files(ProductImage._meta.get_field('image'), attachment) as names:
+            # Locked so two requests cannot create the same combination
+            product = Products.objects.select_for_update(of=('self',)).get(pk=validated_data['product'].pk)
+
+            existing = defaultdict(set)
+            for variant_id, attribute_id, value in VariantAttributes.objects.filter(
+                variant__product=product
+            ).values_list('variant_id', 'attributes_id', 'value'):
+                existing[variant_id].add((attribute_id, value))
+            existing = {frozenset(values) for values in existing.values()}
+
+            combinations = list(itertools.product(*[
+                [(attribute, value) for value in values] for attribute, values in validated_data['attributes']
+            ]))
+            total = len(combinations)
+            combinations = [
+                combination for combination in combinations
+                if frozenset((attribute.pk, value) for attribute, value in combination) not in existing
+            ]
+            if not combinations:
+                raise serializers.ValidationError({'attributes': 'Every combination already has a variant.'})
+
+            variants = Variant.objects.bulk_create([
+                Variant(
+                    product=product, stock=validated_data['stock'], selling_price=validated_data['selling_price'],
+                    **create_values(Variant, user)
+                ) for _ in combinations
+            ])
+            VariantAttributes.objects.bulk_create([
+                VariantAttributes(
+                    variant=variant, attributes=attribute, value=value, name=attribute.name,
+                    **create_values(VariantAttributes, user)
+                )
+                for variant, combination in zip(variants, combinations) for attribute, value in combination
+            ])
+            images = ProductImage.objects.bulk_create([
+                ProductImage(product=product, image=name, name=file.name, **create_values(ProductImage, user))
+                for file, name in zip(attachment, names)
+            ])
+
+            # bulk_create skips save() and its receivers: the facets, stock and card of the
+            # product are refreshed and the renditions queued once the rows are committed
+            pks = [variant.pk for variant in variants]
+            transaction.on_commit(lambda: post_bulk_update.send(sender=Variant, pks=pks))
+            for image in images:
+                queue_renditions(ProductImage, image)
+
+        for model in (Variant, VariantAttributes, ProductImage):
+            bump_model_version(model)
+
+        return {
+            'product': product,
+            'variants': list(zip(variants, combinations)),
+            'skipped': total - len(combinations),
+        }
+
+
 class AddProductCollectionSerializer(serializers.Serializer):
     product = serializers.PrimaryKeyRelatedField(
         queryset=Products.objects.all().order_by('-id')
@@ -385,6 +632,10 @@ class CollectionItemsModelSerializer(serializers.ModelSerializer):
 class CollectionItemsModelSerializerGET(serializers.ModelSerializer):
     product = ProductsModelSerializerGET(read_only=True)
 
+    prefetch_plan = {
+        'nested': {'product': ProductsModelSerializerGET},
+    }
+
     class Meta:
         model = CollectionItems
         fields = ['product']
@@ -411,6 +662,11 @@ class LookBookItemsModelSerializerGET(serializers.ModelSerializer):
     created_by = serializers.SerializerMethodField()
     updated_by = serializers.SerializerMethodField()
 
+    prefetch_plan = {
+        'select_related': ('created_by', 'updated_by'),
+        'nested': {'product': ProductsModelSerializerGET},
+    }
+
     def get_created_by(self, attrs):
         return str(attrs.created_by if attrs.created_by else '')
 
@@ -1,3 +1,173 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from setup.cache import bump_model_version
+from setup.signals import post_bulk_update
+from setup.tasks import run_in_background
+
+from masterdata.models import Brand
+from masterdata.models import Attribute
+from product.models import Products
+from product.models import Variant
+from product.models import VariantAttributes
+from product.models import ProductImage
+from product.models import ProductCard
+from product.models import Collection
+from product.models import CollectionItems
+from product.models import LookBook
+from product.models import LookBookItems
+from customer.home_snapshot import refresh_home_snapshot
+
+
+def refresh_variant_facets(product_id):
+    Products.refresh_variant_facets(product_id)
+    ProductCard.refresh(product_id)
+
+
+def refresh_products_variant_facets(product_ids):
+    for product_id in product_ids:
+        refresh_variant_facets(product_id)
+
+
+def refresh_bulk_updated_products(product_ids, facets=False):
+    Products.refresh_search_vector(pk__in=product_ids)
+    for product_id in product_ids:
+        if facets:
+            refresh_variant_facets(product_id)
+        else:
+            ProductCard.refresh(product_id)
+
+
+@receiver(post_bulk_update, sender=Products)
+def product_bulk_update(sender, pks, **kwargs):
+    run_in_background(refresh_bulk_updated_products, pks)
+
+
+@receiver(post_bulk_update, sender=Variant)
+def variant_bulk_update(sender, pks, **kwargs):
+    product_ids = set(Variant._base_manager.filter(pk__in=pks).values_list('product_id', flat=True))
+    run_in_background(refresh_bulk_updated_products, sorted(product_ids), facets=True)
+
+
+@receiver(post_bulk_update, sender=VariantAttributes)
+def variant_attribute_bulk_update(sender, pks, **kwargs):
+    product_ids = set(VariantAttributes._base_manager.filter(pk__in=pks).values_list(
+        'variant__product_id', flat=True
+    ))
+    run_in_background(refresh_bulk_updated_products, sorted(product_ids), facets=True)
+
+
+@receiver(post_save, sender=Products)
+def product_card_product_save(sender, instance, **kwargs):
+    ProductCard.refresh(instance.pk)
+
+
+@receiver(post_save, sender=Products)
+def product_search_vector_save(sender, instance, **kwargs):
+    Products.refresh_search_vector(pk=instance.pk)
+
+
+@receiver(m2m_changed, sender=Products.categories.through)
+def product_categories_change(sender, **kwargs):
+    bump_model_version(Products)
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+def product_card_variant_change(sender, instance, **kwargs):
+    refresh_variant_facets(instance.product_id)
+
+
+@receiver(post_save, sender=VariantAttributes)
+@receiver(post_delete, sender=VariantAttributes)
+def product_card_variant_attribute_change(sender, instance, **kwargs):
+    if instance.variant_id:
+        refresh_variant_facets(instance.variant.product_id)
+
+
+@receiver(post_save, sender=Attribute)
+def product_card_attribute_save(sender, instance, **kwargs):
+    # The facets are keyed by the attribute name. A common attribute (eg: Size) is used by
+    # most products, they are refreshed in the background
+    products = Variant.objects.filter(variant__attributes=instance).values_list('product_id', flat=True)
+    product_ids = sorted(set(products))
+    if product_ids:
+        run_in_background(refresh_products_variant_facets, product_ids)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_card_image_change(sender, instance, **kwargs):
+    product_id = instance.product_id
+    if not product_id and instance.variant_id:
+        product_id = instance.variant.product_id
+    if product_id:
+        ProductCard.refresh(product_id)
+
+
+@receiver(post_save, sender=Brand)
+def product_card_brand_save(sender, instance, **kwargs):
+    if instance.deleted:
+        # Products of a deleted brand are hidden from the storefront
+        ProductCard.objects.filter(brand=instance).delete()
+    else:
+        ProductCard.objects.filter(brand=instance).update(brand_name=instance.name)
+        for product_id in Products.objects.filter(brand=instance, card__isnull=True).values_list('pk', flat=True):
+            ProductCard.refresh(product_id)
+
+
+@receiver(post_save, sender=Brand)
+def product_search_vector_brand_save(sender, instance, **kwargs):
+    # The brand name is part of the search document of its products
+    Products.refresh_search_vector(brand=instance)
+
+
+@receiver(post_save, sender=Collection)
+@receiver(post_delete, sender=Collection)
+@receiver(post_save, sender=LookBook)
+@receiver(post_delete, sender=LookBook)
+def home_snapshot_section_change(sender, instance, **kwargs):
+    # Also when it leaves the home page, the snapshot does not know what was on it before
+    refresh_home_snapshot()
+
+
+@receiver(post_save, sender=CollectionItems)
+@receiver(post_delete, sender=CollectionItems)
+def home_snapshot_collection_item_change(sender, instance, **kwargs):
+    if Collection._base_manager.filter(pk=instance.collection_id, is_in_home_page=True).exists():
+        refresh_home_snapshot()
+
+
+@receiver(post_save, sender=LookBookItems)
+@receiver(post_delete, sender=LookBookItems)
+def home_snapshot_look_book_item_change(sender, instance, **kwargs):
+    if LookBook._base_manager.filter(pk=instance.look_book_id, is_in_home_page=True).exists():
+        refresh_home_snapshot()
+
+
+@receiver(post_bulk_update, sender=CollectionItems)
+def home_snapshot_collection_items_bulk_update(sender, pks, **kwargs):
+    if CollectionItems._base_manager.filter(pk__in=pks, collection__is_in_home_page=True).exists():
+        refresh_home_snapshot()
+
+
+@receiver(post_save, sender=Products)
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def home_snapshot_product_change(sender, instance, **kwargs):
+    # Images of a variant only are not part of the product payload
+    product_id = instance.pk if sender is Products else instance.product_id
+    if product_id:
+        refresh_home_snapshot([product_id])
+
+
+@receiver(post_bulk_update, sender=Products)
+def home_snapshot_products_bulk_update(sender, pks, **kwargs):
+    refresh_home_snapshot(pks)
+
+
 # from django.db.models.signals import post_save, post_delete
 # from django.dispatch import receiver
 # from algoliasearch_django import AlgoliaIndex
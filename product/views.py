@@ -3,13 +3,23 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from drf_spectacular.utils import extend_schema
+from rest_framework import filters
+from django_filters.rest_framework import DjangoFilterBackend
 
 from setup.views import BaseModelViewSet
+from setup.views import PrefetchPlanMixin
 from setup.export import ExportData
-from setup.utils import compress_image
+from setup.filters import FullTextSearchFilter
+from setup.cache import bump_model_version
+from setup.uploads import uploaded_files
+from setup.bulk import BulkActionMixin
+from setup.bulk import audit_values
+from setup.bulk import create_values
+from setup.signals import post_bulk_update
 
 from product.models import Products
 from product.models import Variant
+from product.models import VariantAttributes
 from masterdata.models import Category
 from product.models import ProductImage
 from product.models import Collection
@@ -33,6 +43,9 @@ from product.serializers import LookBookModelSerializerGET
 from product.serializers import AddToCollectionSerializer
 from product.serializers import AddToLookBookSerializer
 from product.serializers import AddProductCollectionSerializer
+from product.serializers import ProductBulkActionSerializer
+from product.serializers import VariantBulkActionSerializer
+from product.serializers import VariantMatrixSerializer
 
 from product.filters import ProductFilter
 from product.filters import VariantFilter
@@ -43,15 +56,24 @@ from product.filters import CollectionItemsFilter
 from product.filters import LookBookItemsFilter
 
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from rest_framework import serializers
+from django.db.models import F
+from django.db.models.functions import Round
 
 
 @extend_schema(tags=["Products"])
-class ProductsModelViewSet(BaseModelViewSet, ExportData):
-    queryset = Products.objects.all().order_by('-id')
+class ProductsModelViewSet(BulkActionMixin, BaseModelViewSet, ExportData):
+    queryset = Products.objects.select_related(
+        'brand', 'gst', 'dimension', 'created_by', 'updated_by'
+    ).prefetch_related('categories', 'product_images').order_by('-id')
+    background_export = True
     serializer_class = ProductsModelSerializer
     retrieve_serializer_class = ProductsModelSerializerGET
     filterset_class = ProductFilter
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     search_fields = ['name']
+    search_vector_field = 'search_vector'
     default_fields = [
         'name',
         'short_description',
@@ -194,9 +216,92 @@ class ProductsModelViewSet(BaseModelViewSet, ExportData):
 
         return Response({'message': message}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['POST'], url_path='bulk', serializer_class=ProductBulkActionSerializer)
+    def bulk(self, request, *args, **kwargs):
+        """
+            API to change many products at once, in one transaction
+
+            Parameters:
+                request (HttpRequest): The HTTP request object containing model data.
+
+            Data:
+                action (char): enable, disable, delete, price, categories or add_to_collection.
+                ids (list): The primary keys of the products, or
+                filters (dict): The filters of the product list, eg: {"brand": 1}.
+                price (decimal), selling_price (decimal), adjust_percent (decimal): For the price action.
+                categories (list), category_mode (char): For the categories action, add, replace or remove.
+                collection (int): For the add_to_collection action.
+
+            Returns:
+                Response: A DRF Response object with the result of every product.
+        """
+        serializer = ProductBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        return self.run_bulk_action(data, getattr(self, f'bulk_{data["action"]}'))
+
+    def bulk_enable(self, queryset, ids, data):
+        queryset.update(is_disabled=False, **audit_values(Products, self.request.user))
+
+    def bulk_disable(self, queryset, ids, data):
+        queryset.update(is_disabled=True, **audit_values(Products, self.request.user))
+
+    def bulk_delete(self, queryset, ids, data):
+        # Products in a collection or look book are kept, like in delete_record
+        skipped = {}
+        for model, name in ((CollectionItems, 'Collection'), (LookBookItems, 'Look Book')):
+            for product_id in model.objects.filter(product__in=ids).values_list('product_id', flat=True):
+                skipped.setdefault(product_id, []).append(name)
+        skipped = {
+            product_id: f"Cannot delete product. It is already linked to one or more {' and '.join(names)}."
+            for product_id, names in skipped.items()
+        }
+
+        queryset.exclude(pk__in=skipped).update(
+            deleted=True, deleted_by=self.request.user,
+            **audit_values(Products, self.request.user)
+        )
+        return skipped
+
+    def bulk_price(self, queryset, ids, data):
+        values = {key: data[key] for key in ('price', 'selling_price') if key in data}
+        if 'adjust_percent' in data:
+            values['selling_price'] = Round(F('selling_price') * (100 + data['adjust_percent']) / 100, 2)
+        queryset.update(**values, **audit_values(Products, self.request.user))
+
+    def bulk_categories(self, queryset, ids, data):
+        through = Products.categories.through
+        category_ids = [category.pk for category in data['categories']]
+
+        if data['category_mode'] == 'remove':
+            through.objects.filter(products_id__in=ids, category_id__in=category_ids).delete()
+        else:
+            if data['category_mode'] == 'replace':
+                through.objects.filter(products_id__in=ids).exclude(category_id__in=category_ids).delete()
+            through.objects.bulk_create([
+                through(products_id=product_id, category_id=category_id)
+                for product_id in ids for category_id in category_ids
+            ], ignore_conflicts=True)
+        queryset.update(**audit_values(Products, self.request.user))
+
+    def bulk_add_to_collection(self, queryset, ids, data):
+        collection = data['collection']
+        existing = set(CollectionItems.objects.filter(collection=collection, product__in=ids).values_list(
+            'product_id', flat=True
+        ))
+        values = create_values(CollectionItems, self.request.user)
+        items = CollectionItems.objects.bulk_create([
+            CollectionItems(collection=collection, product_id=product_id, **values)
+            for product_id in ids if product_id not in existing
+        ])
+        pks = [item.pk for item in items]
+        transaction.on_commit(lambda: post_bulk_update.send(sender=CollectionItems, pks=pks))
+        bump_model_version(CollectionItems)
+        return {product_id: f'Already added to {collection.name}.' for product_id in existing}
+
 
 @extend_schema(tags=["Products"])
-class VariantModelViewSet(BaseModelViewSet):
+class VariantModelViewSet(BulkActionMixin, BaseModelViewSet):
     queryset = Variant.objects.all().order_by('-id')
     serializer_class = VariantModelSerializer
     retrieve_serializer_class = VariantModelSerializerGET
@@ -225,37 +330,25 @@ class VariantModelViewSet(BaseModelViewSet):
         existing_images = request.data.get('existing_images', [])
         if existing_images:
             existing_images = json.loads(existing_images)
-            # Remove images not in the existing list
-            instance.variant_images.exclude(id__in=existing_images).delete()
-        
-        # Handle new images
+
+        # New images are uploaded in parallel first, the thumbnail and renditions are generated in the background
         new_images = request.FILES.getlist('images', [])
-        for file in new_images:
-            compressed_image = compress_image(file)
-            img_obj = instance.variant_images.create(
-                image=file,
-                name=file.name,
-            )
-            img_obj.thumbnail.save(f"thumbnail_{file.name}", compressed_image)
-            img_obj.save()
-
-        attributes = serializer.validated_data.pop('attributes', None)
-        obj = self.perform_db_action(serializer)
-
-        if attributes:
-            for i in attributes:
-                attribute_instance = i.get('id', None)
-
-                if attribute_instance:
-                    attribute = obj.variant.get(pk=attribute_instance)
-                    attribute.attributes_id = i['attribute']
-                    attribute.value = i['value']
-                    attribute.save()
-                else:
-                    obj.variant.create(**{
-                        'attributes': i['attributes'],
-                        'value': i['value'],
-                    })
+        with uploaded_files(ProductImage._meta.get_field('image'), new_images) as names:
+            if existing_images:
+                # Remove images not in the existing list
+                instance.variant_images.exclude(id__in=existing_images).delete()
+
+            for file, name in zip(new_images, names):
+                instance.variant_images.create(
+                    image=name,
+                    name=file.name,
+                )
+
+            attributes = serializer.validated_data.pop('attributes', None)
+            obj = self.perform_db_action(serializer)
+
+            if attributes:
+                self.save_attributes(obj, attributes)
         return Response(
             {
                 'data': serializer.data,
@@ -264,6 +357,119 @@ class VariantModelViewSet(BaseModelViewSet):
             status=status.HTTP_200_OK
         )
 
+    def save_attributes(self, obj, attributes):
+        """
+            Write the attributes of the variant, the changed rows with one UPDATE and the new ones with one INSERT.
+        """
+        user = self.request.user
+        existing = obj.variant.in_bulk([i['id'] for i in attributes if i.get('id')])
+        changed, added = [], []
+        for i in attributes:
+            attribute_id = i.get('attribute', i.get('attributes'))
+            if i.get('id'):
+                attribute = existing.get(i['id'])
+                if attribute is None:
+                    raise serializers.ValidationError({'attributes': f'Attribute {i["id"]} not found on the variant.'})
+                attribute.attributes_id = attribute_id
+                attribute.value = i['value']
+                attribute.name = i.get('name', attribute.name)
+                for field, value in audit_values(VariantAttributes, user).items():
+                    setattr(attribute, field, value)
+                changed.append(attribute)
+            else:
+                added.append(VariantAttributes(
+                    variant=obj, attributes_id=attribute_id, value=i['value'], name=i.get('name', ''),
+                    **create_values(VariantAttributes, user)
+                ))
+
+        if changed:
+            VariantAttributes.objects.bulk_update(
+                changed, ['attributes', 'value', 'name', *audit_values(VariantAttributes, user)]
+            )
+        added = VariantAttributes.objects.bulk_create(added)
+
+        pks = [attribute.pk for attribute in changed + added]
+        transaction.on_commit(lambda: post_bulk_update.send(sender=VariantAttributes, pks=pks))
+        bump_model_version(VariantAttributes)
+
+    @action(detail=False, methods=['POST'], url_path='matrix', serializer_class=VariantMatrixSerializer)
+    def matrix(self, request, *args, **kwargs):
+        """
+            API to create the variants of a product from every combination of the attribute values
+
+            Parameters:
+                request (HttpRequest): The HTTP request object containing model data.
+
+            Data:
+                product (int): The primary key of the product.
+                attributes (json): The values of each attribute,
+                    eg: [{"attribute": 1, "values": ["S", "M"]}, {"attribute": 2, "values": ["Red", "Blue"]}]
+                stock (int): The stock of every new variant.
+                selling_price (decimal): The selling price of every new variant.
+                images (list): Images shared by the variants, attached to the product.
+
+            Returns:
+                Response: A DRF Response object with the created variants and the number of
+                          combinations skipped because the product has them already.
+        """
+        serializer = VariantMatrixSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+
+        return Response(
+            {
+                'data': {
+                    'product': result['product'].pk,
+                    'variants': [
+                        {'id': variant.pk, 'attributes': {attribute.name: value for attribute, value in combination}}
+                        for variant, combination in result['variants']
+                    ],
+                    'skipped': result['skipped'],
+                },
+                'message': f'{len(result["variants"])} variants created.'
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['POST'], url_path='bulk', serializer_class=VariantBulkActionSerializer)
+    def bulk(self, request, *args, **kwargs):
+        """
+            API to change many variants at once, in one transaction
+
+            Parameters:
+                request (HttpRequest): The HTTP request object containing model data.
+
+            Data:
+                action (char): delete, price or stock.
+                ids (list): The primary keys of the variants, or
+                filters (dict): The filters of the variant list, eg: {"product": 1}.
+                selling_price (decimal), adjust_percent (decimal): For the price action.
+                stock (int): For the stock action.
+
+            Returns:
+                Response: A DRF Response object with the result of every variant.
+        """
+        serializer = VariantBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        return self.run_bulk_action(data, getattr(self, f'bulk_{data["action"]}'))
+
+    def bulk_delete(self, queryset, ids, data):
+        queryset.update(
+            deleted=True, deleted_by=self.request.user,
+            **audit_values(Variant, self.request.user)
+        )
+
+    def bulk_price(self, queryset, ids, data):
+        if 'adjust_percent' in data:
+            selling_price = Round(F('selling_price') * (100 + data['adjust_percent']) / 100, 2)
+        else:
+            selling_price = data['selling_price']
+        queryset.update(selling_price=selling_price, **audit_values(Variant, self.request.user))
+
+    def bulk_stock(self, queryset, ids, data):
+        queryset.update(stock=data['stock'], **audit_values(Variant, self.request.user))
+
 
 @extend_schema(tags=["Products"])
 class ProductImageModelViewSet(BaseModelViewSet):
@@ -279,21 +485,9 @@ class ProductImageModelViewSet(BaseModelViewSet):
     ]
     filterset_class = ProductImageFilter
 
-    def perform_db_action(self, serializer, action='create'):
-        obj = serializer.save()
-
-        if obj.image:
-            compressed_image = compress_image(serializer.validated_data['image'])
-            try:
-                # obj.thumbnail = compressed_image
-                obj.thumbnail.save(f"thumbnail_{obj.image.name}", compressed_image)
-                obj.save()
-            except Exception as e:
-                print('Exception e : ', str(e))
-
 
 @extend_schema(tags=["Products"])
-class CollectionModelViewSet(BaseModelViewSet, ExportData):
+class CollectionModelViewSet(PrefetchPlanMixin, BaseModelViewSet, ExportData):
     queryset = Collection.objects.all().order_by('-id')
     serializer_class = CollectionModelSerializer
     retrieve_serializer_class = CollectionModelSerializerGET
@@ -336,7 +530,7 @@ class CollectionModelViewSet(BaseModelViewSet, ExportData):
 
 
 @extend_schema(tags=["Products"])
-class CollectionItemsModelViewSet(BaseModelViewSet):
+class CollectionItemsModelViewSet(PrefetchPlanMixin, BaseModelViewSet):
     queryset = CollectionItems.objects.all().order_by('-id')
     serializer_class = CollectionItemsModelSerializer
     retrieve_serializer_class = CollectionItemsModelSerializerGET
@@ -349,7 +543,7 @@ class CollectionItemsModelViewSet(BaseModelViewSet):
 
 
 @extend_schema(tags=["Products"])
-class LookBookModelViewSet(BaseModelViewSet, ExportData):
+class LookBookModelViewSet(PrefetchPlanMixin, BaseModelViewSet, ExportData):
     queryset = LookBook.objects.all().order_by('-id')
     serializer_class = LookBookModelSerializer
     retrieve_serializer_class = LookBookModelSerializerGET
@@ -392,7 +586,7 @@ class LookBookModelViewSet(BaseModelViewSet, ExportData):
 
 
 @extend_schema(tags=["Products"])
-class LookBookItemsModelViewSet(BaseModelViewSet):
+class LookBookItemsModelViewSet(PrefetchPlanMixin, BaseModelViewSet):
     queryset = LookBookItems.objects.all().order_by('-id')
     serializer_class = LookBookItemsModelSerializer
     retrieve_serializer_class = LookBookItemsModelSerializerGET
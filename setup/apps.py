@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class SetupConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "setup"
+
+    def ready(self):
+        from django.apps import apps
+        from django.db.models.signals import post_save
+        from setup.renditions import RENDITION_FIELDS
+        from setup.renditions import queue_renditions
+
+        for label in RENDITION_FIELDS:
+            post_save.connect(queue_renditions, sender=apps.get_model(label), dispatch_uid=f'renditions:{label}')
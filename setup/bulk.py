@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework import status
+from rest_framework.response import Response
+
+from setup.cache import bump_model_version
+from setup.signals import post_bulk_update
+
+BULK_ACTION_MAX_ROWS = getattr(settings, 'BULK_ACTION_MAX_ROWS', 5000)
+
+
+class BulkActionSerializer(serializers.Serializer):
+    """
+        The rows of a bulk action, by `ids` or by `filters` (the filters of the list endpoint).
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False, max_length=BULK_ACTION_MAX_ROWS
+    )
+    filters = serializers.DictField(required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if not attrs.get('ids') and not attrs.get('filters'):
+            raise serializers.ValidationError('Select the rows with `ids` or `filters`.')
+        return attrs
+
+
+def audit_values(model, user):
+    """
+        The audit fields BaseModel.save stamps, for the set based updates that skip it.
+    """
+    values = {'updated_by': user if user and user.is_authenticated else None}
+    now = timezone.now()
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False):
+            values[field.name] = now
+    return values
+
+
+def create_values(model, user):
+    """
+        The audit fields BaseModel.save stamps on new rows, for bulk_create.
+    """
+    values = audit_values(model, user)
+    values['created_by'] = values['updated_by']
+    return values
+
+
+class BulkActionMixin:
+    """
+        Viewset mixin running a bulk action over many rows in one transaction.
+
+        The action is a callable `apply(queryset, ids, data)` writing the change with set
+        based statements. It returns a dict of the ids it left out and why, every other
+        selected row is reported as updated.
+    """
+
+    def get_bulk_queryset(self, data):
+        queryset = self.get_queryset().select_related(None).prefetch_related(None).order_by()
+        if data.get('ids'):
+            return queryset.filter(pk__in=data['ids'])
+
+        filterset = self.filterset_class(data=data['filters'], queryset=queryset, request=self.request)
+        # Unknown keys are ignored by the filterset, they must not select the whole table
+        if not set(data['filters']) & set(filterset.filters) or not filterset.is_valid():
+            raise serializers.ValidationError({'filters': filterset.errors or 'No known filter given.'})
+        return filterset.qs
+
+    def run_bulk_action(self, data, apply):
+        model = self.queryset.model
+
+        with transaction.atomic():
+            ids = list(
+                self.get_bulk_queryset(data).select_for_update(of=('self',)).values_list('pk', flat=True)
+                [:BULK_ACTION_MAX_ROWS + 1]
+            )
+            if len(ids) > BULK_ACTION_MAX_ROWS:
+                raise serializers.ValidationError(f'Bulk actions are limited to {BULK_ACTION_MAX_ROWS} rows.')
+
+            skipped = apply(model._base_manager.filter(pk__in=ids), ids, data) or {}
+            updated = [pk for pk in ids if pk not in skipped]
+            if updated:
+                transaction.on_commit(lambda: post_bulk_update.send(sender=model, pks=updated))
+        bump_model_version(model)
+
+        results = [{'id': pk, 'status': 'updated'} for pk in updated]
+        results += [{'id': pk, 'status': 'skipped', 'message': message} for pk, message in skipped.items()]
+        found = set(ids)
+        results += [{'id': pk, 'status': 'not_found'} for pk in data.get('ids', []) if pk not in found]
+
+        return Response({
+            'message': f'{len(updated)} of {len(ids)} rows updated.',
+            'results': results,
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,294 @@
+import time
+import threading
+from collections import Counter
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+VERSION_CACHE_ALIAS = getattr(settings, 'VERSION_CACHE_ALIAS', 'shared')
+CACHE_STATS_FLUSH_EVERY = getattr(settings, 'CACHE_STATS_FLUSH_EVERY', 50)
+
+# Small, rarely written tables served from worker memory
+REFERENCE_CACHE_MODELS = getattr(settings, 'REFERENCE_CACHE_MODELS', (
+    'masterdata.brand', 'masterdata.category', 'masterdata.attribute', 'masterdata.attributegroup',
+    'masterdata.dimension', 'masterdata.returnreason', 'inventory.tax',
+))
+REFERENCE_CACHE_SIZE = getattr(settings, 'REFERENCE_CACHE_SIZE', 64)
+REFERENCE_CACHE_TIMEOUT = getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 60 * 60)
+# Seconds a worker trusts its copy before checking the version key again
+REFERENCE_CACHE_CHECK_INTERVAL = getattr(settings, 'REFERENCE_CACHE_CHECK_INTERVAL', 1)
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def get_versions(*names):
+    """
+        Function to get the current cache versions of the names.
+
+        Versions live in the shared cache so every worker sees a bump. A missing version
+        is created, `add` keeps the first one when workers race.
+
+        :param names: The versioned names, eg: a model label.
+        :return: dict of name and version.
+    """
+    cache = caches[VERSION_CACHE_ALIAS]
+    keys = {version_key(name): name for name in names}
+
+    versions = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing))
+
+    return {name: versions.get(key) for key, name in keys.items()}
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump_version(*names):
+    """
+        Function to invalidate everything cached under the versions of the names.
+        The bump waits for the commit, so nothing is cached from uncommitted data.
+    """
+    def bump():
+        caches[VERSION_CACHE_ALIAS].set_many({version_key(name): time.time_ns() for name in names}, None)
+        # The writing worker drops its own copies at once, the others on their next check
+        for name in names:
+            if name in ReferenceCache.registry:
+                ReferenceCache.registry[name].checked_at = 0
+
+    transaction.on_commit(bump)
+
+
+def model_version_name(model):
+    """
+        Name of the version stamp of a model, bumped on every save of its rows.
+    """
+    return f'model:{model._meta.label_lower}'
+
+
+def is_cache_versioned(model):
+    return getattr(model, 'cache_versioned', False)
+
+
+def require_cache_versioned(*models):
+    """
+        Only the models with `cache_versioned` set are bumped on save, the stamp of any
+        other model would never move: caching by it is a configuration error.
+    """
+    for model in models:
+        if not is_cache_versioned(model):
+            raise ImproperlyConfigured(f'{model._meta.label} is cached by version, set cache_versioned = True on it.')
+
+
+def get_model_versions(*models):
+    """
+        Function to get the version stamps of the models, by version name.
+    """
+    require_cache_versioned(*models)
+    return get_versions(*(model_version_name(model) for model in models))
+
+
+def bump_model_version(*models):
+    # The stamps of the other models are never read, bumping them would only cost a cache write
+    names = [model_version_name(model) for model in models if is_cache_versioned(model)]
+    if names:
+        bump_version(*names)
+
+
+class CacheStats:
+    """
+        Hit and miss counters of a cache.
+
+        Counts are kept in the worker and added to the shared cache every
+        CACHE_STATS_FLUSH_EVERY events, so the totals cover every worker without
+        a cache write per request.
+    """
+    registry = {}
+
+    def __init__(self, name):
+        self.name = name
+        self.pending = Counter()
+        self.lock = threading.Lock()
+        CacheStats.registry[name] = self
+
+    def key(self, event):
+        return f'cache-stats:{self.name}:{event}'
+
+    def hit(self):
+        self.record('hits')
+
+    def miss(self):
+        self.record('misses')
+
+    def record(self, event):
+        with self.lock:
+            self.pending[event] += 1
+            if sum(self.pending.values()) < CACHE_STATS_FLUSH_EVERY:
+                return
+            pending, self.pending = self.pending, Counter()
+
+        cache = caches[VERSION_CACHE_ALIAS]
+        for name, count in pending.items():
+            cache.add(self.key(name), 0, None)
+            cache.incr(self.key(name), count)
+
+    def get_stats(self):
+        """
+            The hits, misses and hit rate of every worker, including the unflushed counts of this one.
+        """
+        totals = caches[VERSION_CACHE_ALIAS].get_many([self.key('hits'), self.key('misses')])
+        hits = totals.get(self.key('hits'), 0) + self.pending['hits']
+        misses = totals.get(self.key('misses'), 0) + self.pending['misses']
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+
+def get_cache_stats():
+    return {name: stats.get_stats() for name, stats in CacheStats.registry.items()}
+
+
+class LRUCache:
+    """
+        Bounded in-process cache, the least recently used entry is dropped first.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_reference_stats = CacheStats('reference.local')
+shared_reference_stats = CacheStats('reference.shared')
+
+
+class ReferenceCache:
+    """
+        Two tier cache of a reference table.
+
+        Lookups are served from an LRU in the worker, then from the shared cache, then
+        from the database. Both tiers are keyed by the model version stamp that
+        BaseModel.save bumps; a worker re-reads the stamp at most every
+        REFERENCE_CACHE_CHECK_INTERVAL seconds and drops its LRU when it moved.
+    """
+    registry = {}
+
+    def __init__(self, model):
+        self.model = model
+        self.name = model_version_name(model)
+        self.local = LRUCache(REFERENCE_CACHE_SIZE)
+        self.version = None
+        self.checked_at = 0
+
+    def get_version(self):
+        now = time.monotonic()
+        if now - self.checked_at >= REFERENCE_CACHE_CHECK_INTERVAL:
+            version = get_version(self.name)
+            if version != self.version:
+                self.local.clear()
+                self.version = version
+            self.checked_at = now
+        return self.version
+
+    def get(self, key, loader):
+        """
+            The cached value of the key, `loader` builds it on a miss of both tiers.
+        """
+        version = self.get_version()
+        value = self.local.get(key)
+        if value is not None:
+            local_reference_stats.hit()
+            return value
+        local_reference_stats.miss()
+
+        shared_key = f'reference:{self.model._meta.label_lower}:{version}:{key}'
+        value = caches[VERSION_CACHE_ALIAS].get(shared_key)
+        if value is None:
+            shared_reference_stats.miss()
+            value = loader()
+            caches[VERSION_CACHE_ALIAS].set(shared_key, value, REFERENCE_CACHE_TIMEOUT)
+        else:
+            shared_reference_stats.hit()
+
+        self.local.set(key, value)
+        return value
+
+    def get_table(self):
+        """
+            Every row of the default manager by primary key. The instances are shared, do not modify them.
+        """
+        return self.get('table', lambda: {obj.pk: obj for obj in self.model._default_manager.order_by()})
+
+    def get_object(self, pk):
+        return self.get_table().get(pk)
+
+
+def reference_cache(model):
+    """
+        The reference cache of the model, None when the model is not in REFERENCE_CACHE_MODELS.
+    """
+    if model._meta.label_lower not in REFERENCE_CACHE_MODELS:
+        return None
+    name = model_version_name(model)
+    if name not in ReferenceCache.registry:
+        require_cache_versioned(model)
+        ReferenceCache.registry[name] = ReferenceCache(model)
+    return ReferenceCache.registry[name]
+
+
+def prime_references(instances, *fields):
+    """
+        Set the reference foreign keys of the instances from the reference cache,
+        so reading them does not query. Returns the instances as a list.
+
+        Deferred foreign keys are skipped, eg: left out by a sparse fieldset. Reading
+        them would load each one with a query of its own, and they are not rendered.
+    """
+    instances = list(instances)
+    for name in fields:
+        field = instances[0]._meta.get_field(name) if instances else None
+        cache = field and reference_cache(field.related_model)
+        if not cache:
+            continue
+        pending = [
+            instance for instance in instances
+            if field.attname not in instance.get_deferred_fields() and not field.is_cached(instance)
+        ]
+        if not pending:
+            continue
+        table = cache.get_table()
+        for instance in pending:
+            related_id = getattr(instance, field.attname)
+            if related_id in table:
+                field.set_cached_value(instance, table[related_id])
+    return instances
@@ -0,0 +1,163 @@
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.exceptions import PermissionDenied
+
+IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif')
+DOCUMENT_TYPES = IMAGE_TYPES + ('application/pdf',)
+
+# How long the presigned POST may be used, and how long after it the upload may be confirmed
+UPLOAD_INTENT_EXPIRE = getattr(settings, 'UPLOAD_INTENT_EXPIRE', 15 * 60)
+UPLOAD_CONFIRM_MAX_AGE = getattr(settings, 'UPLOAD_CONFIRM_MAX_AGE', 60 * 60)
+UPLOAD_MAX_SIZE = getattr(settings, 'UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+
+UPLOAD_SALT = 'setup.direct_uploads'
+
+# Files the clients may upload straight to storage.
+#   model / field: the file field the object key is attached to.
+#   parent / parent_field: a new `model` row is created under the parent object,
+#                          without them the file of the object itself is replaced.
+#   owner: the object must be created by the customer, else super users only.
+UPLOAD_TARGETS = {
+    'product_image': {
+        'model': 'product.productimage', 'field': 'image',
+        'parent': 'product.products', 'parent_field': 'product',
+        'content_types': IMAGE_TYPES, 'owner': False,
+    },
+    'variant_image': {
+        'model': 'product.productimage', 'field': 'image',
+        'parent': 'product.variant', 'parent_field': 'variant',
+        'content_types': IMAGE_TYPES, 'owner': False,
+    },
+    'review_image': {
+        'model': 'customer.reviewimage', 'field': 'file',
+        'parent': 'customer.review', 'parent_field': 'review',
+        'content_types': IMAGE_TYPES, 'owner': True,
+    },
+    'return_bill': {
+        'model': 'customer.return', 'field': 'purchase_bill',
+        'content_types': DOCUMENT_TYPES, 'owner': True,
+    },
+    'hero_image': {
+        'model': 'cms.herosection', 'field': 'image',
+        'content_types': IMAGE_TYPES, 'owner': False,
+    },
+}
+
+
+def check_target_permission(target, user):
+    if UPLOAD_TARGETS[target]['owner']:
+        allowed = user.is_customer and not user.is_suspended
+    else:
+        allowed = user.is_superuser
+    if not allowed:
+        raise PermissionDenied()
+
+
+def get_target_object(target, object_id, user):
+    """
+        The object the upload is attached to, the parent for new rows. Customers only find their own.
+    """
+    config = UPLOAD_TARGETS[target]
+    model = apps.get_model(config.get('parent', config['model']))
+    queryset = model.objects.all()
+    if config['owner']:
+        queryset = queryset.filter(created_by=user)
+    obj = queryset.filter(pk=object_id).first()
+    if obj is None:
+        raise serializers.ValidationError({'object_id': 'Object not found.'})
+    return obj
+
+
+def create_upload_intent(target, object_id, filename, content_type, size, user):
+    """
+        Function to issue a presigned POST, the client uploads the file straight to storage with it.
+
+        :param target: The UPLOAD_TARGETS key, eg: product_image.
+        :param object_id: The object the file is for, checked now so a stray upload is refused early.
+        :param filename: The name of the file of the client.
+        :param content_type: The content type of the file, the policy only accepts this one.
+        :param size: The size of the file in bytes.
+        :param user: The user uploading the file.
+        :return: dict with the `upload_id` to confirm with, and the `url` and `fields` of the POST.
+    """
+    check_target_permission(target, user)
+    config = UPLOAD_TARGETS[target]
+
+    if content_type not in config['content_types']:
+        raise serializers.ValidationError({'content_type': f'Allowed types are {", ".join(config["content_types"])}.'})
+    if size > UPLOAD_MAX_SIZE:
+        raise serializers.ValidationError({'size': f'Files up to {UPLOAD_MAX_SIZE} bytes are allowed.'})
+
+    get_target_object(target, object_id, user)
+
+    model = apps.get_model(config['model'])
+    field = model._meta.get_field(config['field'])
+    if not hasattr(field.storage, 'presigned_post'):
+        raise serializers.ValidationError({'target': 'Direct uploads are not supported by the file storage.'})
+
+    # A unique name, the policy is bound to it and the file is never overwritten
+    name = field.generate_filename(model(), f'{uuid.uuid4().hex}_{filename}')
+    post = field.storage.presigned_post(name, content_type, UPLOAD_MAX_SIZE, UPLOAD_INTENT_EXPIRE)
+
+    upload_id = signing.dumps({
+        'target': target, 'object_id': object_id, 'name': name, 'filename': filename, 'user': user.pk,
+    }, salt=UPLOAD_SALT)
+    return {'upload_id': upload_id, 'name': name, 'url': post['url'], 'fields': post['fields']}
+
+
+def confirm_upload(upload_id, user, alt_text=''):
+    """
+        Function to attach an uploaded file to its object.
+
+        The file is checked in storage first. Saving the row queues its renditions like an
+        upload through the app. Confirming the same upload again returns the same object.
+
+        :param upload_id: The `upload_id` of the upload intent.
+        :param user: The user confirming, the one who asked for the intent.
+        :param alt_text: Alt text of product images.
+        :return: tuple of the object the file is attached to and its file.
+    """
+    try:
+        intent = signing.loads(upload_id, salt=UPLOAD_SALT, max_age=UPLOAD_CONFIRM_MAX_AGE)
+    except signing.BadSignature:
+        raise serializers.ValidationError({'upload_id': 'Invalid or expired upload.'})
+    if intent['user'] != user.pk:
+        raise PermissionDenied()
+
+    target = intent['target']
+    check_target_permission(target, user)
+    config = UPLOAD_TARGETS[target]
+    model = apps.get_model(config['model'])
+    field = model._meta.get_field(config['field'])
+    name = intent['name']
+
+    if not field.storage.exists(name):
+        raise serializers.ValidationError({'upload_id': 'The file is not uploaded yet.'})
+
+    with transaction.atomic():
+        parent = get_target_object(target, intent['object_id'], user)
+
+        if 'parent' not in config:
+            obj = parent
+            if getattr(obj, config['field']).name != name:
+                setattr(obj, config['field'], name)
+                obj.save()
+            return obj, getattr(obj, config['field'])
+
+        obj = model.objects.filter(**{config['field']: name}).first()
+        if obj is not None:
+            return obj, getattr(obj, config['field'])
+
+        values = {config['parent_field']: parent, config['field']: name}
+        model_fields = {f.name for f in model._meta.get_fields()}
+        if 'name' in model_fields:
+            values['name'] = intent['filename']
+        if 'alt_text' in model_fields:
+            values['alt_text'] = alt_text
+        obj = model.objects.create(**values)
+    return obj, getattr(obj, config['field'])
@@ -1,20 +1,288 @@
+import csv
 import json
+import pickle
+import tempfile
+import threading
 
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db import transaction
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Border, Side
+from openpyxl.utils import get_column_letter
+from rest_framework import status
 from rest_framework.decorators import action
-from django.http import HttpResponse
+from rest_framework.response import Response
+from django.core.files import File
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 import datetime
 
+from setup.models import ExportJob
+from setup.serializer import ExportJobSerializer
+from setup.utils import is_internal_field
 
-class ExportData:
+# Rows fetched (and prefetched) per query while exporting
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+EXPORT_STREAM_BLOCK_SIZE = 64 * 1024
+# Seconds the export worker waits before looking for pending jobs again
+EXPORT_WORKER_POLL_INTERVAL = getattr(settings, 'EXPORT_WORKER_POLL_INTERVAL', 2)
+# A running job is stamped every EXPORT_HEARTBEAT_INTERVAL seconds, one without a stamp
+# for EXPORT_HEARTBEAT_TIMEOUT seconds lost its worker (eg: its container was replaced)
+EXPORT_HEARTBEAT_INTERVAL = getattr(settings, 'EXPORT_HEARTBEAT_INTERVAL', 30)
+EXPORT_HEARTBEAT_TIMEOUT = getattr(settings, 'EXPORT_HEARTBEAT_TIMEOUT', 5 * 60)
+
+EXPORT_FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """
+        File like object handing back what is written to it, for csv.writer in a generator.
+    """
+
+    def write(self, value):
+        return value
+
+
+class TableExport:
+    """
+        Export engine writing the rows of a queryset as xlsx, csv or ndjson.
+
+        The foreign keys of the exported fields are joined with select_related and the
+        many to many relations prefetched, a chunk of EXPORT_CHUNK_SIZE rows at a time,
+        so the export costs a few queries per chunk instead of several per row.
+        Nothing is kept in memory: csv and ndjson are streamed row by row and the xlsx
+        is written in write_only mode to a temporary file, then streamed from it.
+    """
     EXCLUDE_FIELDS = ['deleted', 'deleted_at', 'deleted_by']
     EMPTY_VALUES = [None, '', ' ', 'undefined', '[]']
+
+    def __init__(self, queryset, selected_fields=None, include_deleted=False, on_progress=None):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.selected_fields = selected_fields or []
+        self.include_deleted = include_deleted
+        # Called with the number of rows written after every chunk
+        self.on_progress = on_progress
+
+    def is_exported(self, field):
+        if is_internal_field(self.model, field):
+            return False
+        if not self.include_deleted and field.name in self.EXCLUDE_FIELDS:
+            return False
+        return not self.selected_fields or field.name in self.selected_fields
+
+    def get_fields(self):
+        fields = [field for field in self.model._meta.fields if self.is_exported(field)]
+        fields += [field for field in self.model._meta.many_to_many if self.is_exported(field)]
+        return fields
+
+    def get_headers(self):
+        return [str(field.verbose_name) for field in self.get_fields()]
+
+    def get_queryset(self):
+        fields = self.get_fields()
+        related = [field.name for field in fields if field.many_to_one or field.one_to_one]
+        many = [field.name for field in fields if field.many_to_many]
+
+        queryset = self.queryset
+        if related:
+            queryset = queryset.select_related(*related)
+        if many:
+            queryset = queryset.prefetch_related(*many)
+        return queryset
+
+    def get_field_data(self, obj, field):
+        if field.many_to_many:
+            return ', '.join(str(item) for item in getattr(obj, field.name).all())
+
+        field_type = field.get_internal_type()
+        data = getattr(obj, field.name)
+        if field_type == 'DateTimeField':
+            data = data.strftime("%Y-%m-%d %I:%M %p") if data not in self.EMPTY_VALUES else ''
+        elif field_type == 'DateField':
+            data = data.strftime("%Y-%m-%d") if data not in self.EMPTY_VALUES else ''
+        elif field_type == 'ForeignKey':
+            data = str(data) if data not in self.EMPTY_VALUES else ''
+        elif field_type == 'BooleanField':
+            data = 'Yes' if data else 'No'
+        else:
+            data = str(data) if data not in self.EMPTY_VALUES else ''
+
+        return data
+
+    def iter_rows(self):
+        fields = self.get_fields()
+        count = 0
+        for obj in self.get_queryset().iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [self.get_field_data(obj, field) for field in fields]
+            count += 1
+            if self.on_progress and count % EXPORT_CHUNK_SIZE == 0:
+                self.on_progress(count)
+        if self.on_progress:
+            self.on_progress(count)
+
+    def iter_csv(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.get_headers())
+        for row in self.iter_rows():
+            yield writer.writerow(row)
+
+    def iter_ndjson(self):
+        names = [field.name for field in self.get_fields()]
+        for row in self.iter_rows():
+            yield json.dumps(dict(zip(names, row))) + '\n'
+
+    def write_xlsx(self, file):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+
+        headers = self.get_headers()
+        border = Border(
+            top=Side(style='thin'), bottom=Side(style='thin'),
+            right=Side(style='thin'), left=Side(style='thin'),
+        )
+        header_cells = []
+        for col, value in enumerate(headers, start=1):
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font = Font(bold=True)
+            cell.border = border
+            header_cells.append(cell)
+            ws.column_dimensions[get_column_letter(col)].width = len(value) + 2
+        ws.freeze_panes = 'A2'
+
+        ws.append(header_cells)
+        for row in self.iter_rows():
+            ws.append(row)
+        wb.save(file)
+
+    def iter_xlsx(self):
+        with tempfile.TemporaryFile() as file:
+            self.write_xlsx(file)
+            file.seek(0)
+            while True:
+                block = file.read(EXPORT_STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+
+    def stream(self, export_format):
+        return getattr(self, f'iter_{export_format}')()
+
+    def write(self, export_format, file):
+        """
+            Function to write the whole export to a binary file.
+        """
+        if export_format == 'xlsx':
+            self.write_xlsx(file)
+            return
+        for chunk in self.stream(export_format):
+            file.write(chunk.encode())
+
+
+def claim_export_job(worker):
+    """
+        Function to take the oldest pending export job for the worker.
+
+        The row is locked with SKIP LOCKED, two workers never take the same job.
+
+        :param worker: The id of the worker, eg: host:pid
+        :return: The job, None when no job is pending.
+    """
+    with transaction.atomic():
+        job = ExportJob.objects.select_for_update(skip_locked=True).filter(
+            status=ExportJob.PENDING
+        ).order_by('id').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=ExportJob.RUNNING, worker=worker, started_at=now, heartbeat_at=now
+        )
+    return job
+
+
+def beat(job_id, stop):
+    """
+        Function stamping the heartbeat of a running job until `stop` is set, on a thread of its own.
+    """
+    try:
+        while not stop.wait(EXPORT_HEARTBEAT_INTERVAL):
+            ExportJob.objects.filter(pk=job_id).update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def get_job_queryset(job):
+    queryset = apps.get_model(job.model)._base_manager.all()
+    queryset.query = pickle.loads(job.query)
+    return queryset
+
+
+def run_export_job(job):
+    """
+        Function to run a claimed export job in the export worker, the file is saved to the storage.
+    """
+    jobs = ExportJob.objects.filter(pk=job.pk)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=beat, args=(job.pk, stop), daemon=True)
+    heartbeat.start()
+
+    try:
+        queryset = get_job_queryset(job)
+        jobs.update(total_rows=queryset.count())
+        export = TableExport(
+            queryset, job.selected_fields, job.include_deleted,
+            on_progress=lambda count: jobs.update(processed_rows=count)
+        )
+        with tempfile.TemporaryFile() as file:
+            export.write(job.export_format, file)
+            file.seek(0)
+            name = f"{job.model.split('.')[-1]}_{job.pk}.{job.export_format}"
+            job.file.save(name, File(file), save=False)
+    except Exception as e:
+        jobs.update(status=ExportJob.FAILED, error=str(e), finished_at=timezone.now())
+        raise
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    jobs.update(status=ExportJob.DONE, file=job.file.name, finished_at=timezone.now())
+
+
+def fail_stale_export_jobs():
+    """
+        Function to mark the running jobs whose worker stopped beating as failed.
+        Jobs of the live workers of every instance are left alone.
+
+        :return: The number of jobs marked.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=EXPORT_HEARTBEAT_TIMEOUT)
+    return ExportJob.objects.filter(status=ExportJob.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True)
+    ).update(status=ExportJob.FAILED, error='The export worker stopped, export again.', finished_at=timezone.now())
+
+
+class ExportData:
+    EXCLUDE_FIELDS = TableExport.EXCLUDE_FIELDS
+    EMPTY_VALUES = TableExport.EMPTY_VALUES
     INCLUDE_DELETED = False
+    SELECTED_FIELDS = []
+    # Exports of large tables run as export jobs instead of in the request
+    background_export = False
 
     def generate_headers(self, model):
         headers = []
         for field in model._meta.fields:
+            if is_internal_field(model, field):
+                continue
             if self.INCLUDE_DELETED or field.name not in self.EXCLUDE_FIELDS:
                 if not self.SELECTED_FIELDS or field.name in self.SELECTED_FIELDS:
                     headers.append(field.verbose_name)
@@ -27,82 +295,51 @@ class ExportData:
 
         return headers
 
-    def get_field_data(self, obj, field):
-        field_type = field.get_internal_type()
-        if self.INCLUDE_DELETED or field.name not in self.EXCLUDE_FIELDS:
-            data = getattr(obj, field.name)
-            if field_type == 'DateTimeField':
-                data = data.strftime("%Y-%m-%d %I:%M %p") if data not in self.EMPTY_VALUES else ''
-            elif field_type == 'DateField':
-                data = data.strftime("%Y-%m-%d") if data not in self.EMPTY_VALUES else ''
-            elif field_type == 'ForeignKey':
-                data = str(data) if data not in self.EMPTY_VALUES else ''
-            elif field_type == 'BooleanField':
-                data = 'Yes' if data else 'No'
-            else:
-                data = str(data) if data not in self.EMPTY_VALUES else ''
-
-            return data
+    def get_export_params(self, request):
+        selected_fields = json.loads(request.GET.get('fields', '[]'))
+        include_deleted = request.GET.get('includeDeleted', '').lower() in ('true', '1', 'yes')
+        export_format = request.GET.get('export_format', 'xlsx').lower()
+        if export_format not in EXPORT_FORMATS:
+            export_format = 'xlsx'
+        return selected_fields, include_deleted, export_format
+
+    def get_export_file_name(self, model, export_format):
+        today = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M")
+        return f"{model.__name__}_{today}.{export_format}"
 
     @action(detail=False, methods=['GET'], url_path='export')
     def generate_excel(self, request, *args, **kwargs):
-        selected_fields = request.GET.get('fields', '[]')
-        include_deleted = request.GET.get('includeDeleted', False)
+        """
+            Export the filtered rows, streamed as they are read.
+
+            Query parameters: `fields` (JSON list of field names), `includeDeleted` and
+            `export_format` (xlsx, csv or ndjson, xlsx by default).
 
-        self.SELECTED_FIELDS = json.loads(selected_fields) # noqa
+            Views with `background_export` queue an export job and answer 202 with it,
+            poll /setup/export-jobs/<id>/ and download the file once it is done.
+        """
+        selected_fields, include_deleted, export_format = self.get_export_params(request)
+        self.SELECTED_FIELDS = selected_fields # noqa
         self.INCLUDE_DELETED = include_deleted
 
         queryset = self.filter_queryset(self.get_queryset())
-        model = queryset.model
-
-        today = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M")
-        file_name = f"{model.__name__}_{today}"
+        if self.background_export:
+            return self.queue_export_job(request, queryset, selected_fields, include_deleted, export_format)
 
-        wb = Workbook()
-        ws = wb.active
-
-        headers = self.generate_headers(model)
-
-        for col, value in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col, value=value)
-            cell.font = Font(bold=True)
-            cell.border = Border(
-                top=Side(style='thin'), bottom=Side(style='thin'),
-                right=Side(style='thin'), left=Side(style='thin'),
-            )
-            ws.column_dimensions[
-                ws.cell(row=1, column=col).column_letter
-            ].width = len(value) + 2
-            ws.row_dimensions[1].height = 30
-            ws.freeze_panes = 'A2'
-
-        for obj in queryset:
-            row = []
-            for field in model._meta.fields:
-                data = self.get_field_data(obj, field)
-                if data:
-                    if not self.SELECTED_FIELDS or field.name in self.SELECTED_FIELDS:
-                        row.append(data)
-
-            # Include many-to-many field data
-            for relation in model._meta.many_to_many:
-                if relation.many_to_many:
-                    related_data = getattr(obj, relation.name).all()
-                    data = ', '.join(str(item) for item in related_data) if related_data else ''
-                    if not self.SELECTED_FIELDS or relation.name in self.SELECTED_FIELDS:
-                        row.append(data)
-
-            ws.append(row)
-
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename={file_name}.xlsx'
-
-        # Save the workbook to the response
-        wb.save(response)
+        export = TableExport(queryset, selected_fields, include_deleted)
 
+        response = StreamingHttpResponse(export.stream(export_format), content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename={self.get_export_file_name(queryset.model, export_format)}'
         return response
 
-
-
-
-
+    def queue_export_job(self, request, queryset, selected_fields, include_deleted, export_format):
+        job = ExportJob.objects.create(
+            model=queryset.model._meta.label_lower,
+            export_format=export_format,
+            filters={key: request.GET.getlist(key) for key in request.GET if key != 'fields'},
+            selected_fields=selected_fields,
+            include_deleted=include_deleted,
+            # The filtered query is only evaluated by the export worker, a process of its own
+            query=pickle.dumps(queryset.query),
+        )
+        return Response(ExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
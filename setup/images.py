@@ -0,0 +1,48 @@
+"""
+    Image encoding of the rendition pipeline.
+
+    Kept free of Django imports, the functions run in the rendition process pool.
+"""
+from io import BytesIO
+
+from PIL import Image
+from PIL import ImageOps
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def render_image(data, widths, formats):
+    """
+        Function to resize an image to the given widths and encode every size in every format.
+
+        Sizes wider than the original are replaced by a single rendition at the original width.
+
+        :param data: The bytes of the original image.
+        :param widths: The widths of the renditions.
+        :param formats: The formats of the renditions, keys of FORMATS.
+        :return: list of (width, format, bytes).
+    """
+    with Image.open(BytesIO(data)) as original:
+        # Phones store the orientation in EXIF, the renditions are stored upright
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        sizes = sorted({width for width in widths if width < image.width})
+        if len(sizes) < len(set(widths)):
+            sizes.append(image.width)
+
+        renditions = []
+        for width in sizes:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            for name in formats:
+                encoder, options = FORMATS[name]
+                frame = resized.convert('RGB') if encoder == 'JPEG' and resized.mode != 'RGB' else resized
+                output = BytesIO()
+                frame.save(output, format=encoder, **options)
+                renditions.append((width, name, output.getvalue()))
+        return renditions
@@ -0,0 +1,274 @@
+import datetime
+import json
+
+import openpyxl
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError
+from django.db import transaction
+from django.utils.text import capfirst
+
+from setup.cache import bump_model_version
+from setup.signals import post_bulk_update
+
+IMPORT_CHUNK_SIZE = getattr(settings, 'IMPORT_CHUNK_SIZE', 1000)
+# Only the first errors are reported, the report stays small on a broken sheet
+IMPORT_MAX_ERRORS = getattr(settings, 'IMPORT_MAX_ERRORS', 1000)
+
+TRUE_VALUES = ('yes', 'true', '1', 'y')
+FALSE_VALUES = ('no', 'false', '0', 'n', '')
+DATETIME_FORMAT = '%Y-%m-%d %I:%M %p'
+
+
+class RowError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class TableImport:
+    """
+        Streaming import of a sheet laid out like the export of the model.
+
+        The header row holds the verbose names (or names) of the fields, as written by
+        `ExportData.generate_headers`. Rows with an `ID` update that row, the others are
+        created. The workbook is read in read only mode and written in chunks of
+        IMPORT_CHUNK_SIZE rows, so memory stays flat whatever the size of the sheet.
+
+        Foreign keys and many to many values are the primary key or the name of the
+        related row, resolved from lookups built once per import.
+    """
+    EXCLUDE_FIELDS = [
+        'created_by', 'created_at', 'updated_by', 'updated_at', 'deleted', 'deleted_at', 'deleted_by',
+    ]
+    NATURAL_KEYS = ('name', 'title')
+
+    def __init__(self, model, user=None, chunk_size=IMPORT_CHUNK_SIZE):
+        self.model = model
+        self.user = user if user is not None and user.is_authenticated else None
+        self.chunk_size = chunk_size
+        self.lookups = {}
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def get_importable_fields(self):
+        # Fields kept up to date by the model itself are never imported
+        exclude = self.EXCLUDE_FIELDS + list(getattr(self.model, 'DENORMALIZED_FIELDS', ()))
+        fields = {}
+        for field in list(self.model._meta.concrete_fields) + list(self.model._meta.many_to_many):
+            if field.name in exclude or (not field.editable and not field.primary_key):
+                continue
+            fields[str(field.verbose_name).strip().lower()] = field
+            fields[field.name.lower()] = field
+        return fields
+
+    def map_columns(self, header):
+        """
+            The field of each column of the header row, None for the columns left out.
+        """
+        fields = self.get_importable_fields()
+        columns = [fields.get(str(value).strip().lower()) if value is not None else None for value in header]
+        if not any(columns):
+            raise ValidationError('None of the columns match a field of the table.')
+        return columns
+
+    def get_lookup(self, field):
+        """
+            dict of the primary keys (as text) and lower cased names of the related rows,
+            names shared by several rows map to None.
+        """
+        if field.name not in self.lookups:
+            related = field.related_model
+            keys = [name for name in self.NATURAL_KEYS if any(f.name == name for f in related._meta.fields)]
+            lookup = {}
+            for row in related._default_manager.order_by().values_list('pk', *keys[:1]).iterator():
+                lookup[str(row[0])] = row[0]
+                if len(row) > 1 and row[1]:
+                    name = str(row[1]).strip().lower()
+                    lookup[name] = None if name in lookup and lookup[name] != row[0] else row[0]
+            self.lookups[field.name] = lookup
+        return self.lookups[field.name]
+
+    def resolve(self, field, value):
+        key = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value).strip()
+        lookup = self.get_lookup(field)
+        key = key if key in lookup else key.lower()
+        if key not in lookup:
+            raise ValidationError(f'{capfirst(field.related_model._meta.verbose_name)} "{value}" does not exist.')
+        if lookup[key] is None:
+            raise ValidationError(f'More than one {field.related_model._meta.verbose_name} is named "{value}".')
+        return lookup[key]
+
+    def to_python(self, field, value):
+        if isinstance(value, str):
+            value = value.strip()
+
+        if field.many_to_many:
+            if value in (None, ''):
+                return []
+            return [self.resolve(field, item) for item in str(value).split(',') if item.strip()]
+
+        if value in (None, ''):
+            if field.primary_key:
+                return None
+            if not field.null and not field.blank and not field.has_default():
+                raise ValidationError('This field is required.')
+            return field.get_default() if field.has_default() else (None if field.null else '')
+
+        if field.many_to_one:
+            return self.resolve(field, value)
+
+        field_type = field.get_internal_type()
+        if field_type == 'BooleanField' and isinstance(value, str):
+            if value.lower() not in TRUE_VALUES + FALSE_VALUES:
+                raise ValidationError('Use Yes or No.')
+            value = value.lower() in TRUE_VALUES
+        elif field_type == 'DateTimeField' and isinstance(value, str):
+            try:
+                value = datetime.datetime.strptime(value, DATETIME_FORMAT)
+            except ValueError:
+                pass
+        elif isinstance(field, ArrayField) and isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                # The export writes the list as python, eg: ['summer', 'cotton']
+                value = [item.strip().strip('\'"') for item in value.strip('[]').split(',') if item.strip()]
+        elif isinstance(value, float) and value.is_integer() and field_type in ('CharField', 'TextField'):
+            value = str(int(value))
+
+        value = field.to_python(value)
+        field.run_validators(value)
+        if field.choices:
+            field.validate(value, None)
+        return value
+
+    def build_row(self, columns, values):
+        """
+            The field values of a sheet row, raises RowError with the message of each bad cell.
+        """
+        data = {}
+        errors = {}
+        for field, value in zip(columns, values):
+            if field is None:
+                continue
+            try:
+                data[field] = self.to_python(field, value)
+            except ValidationError as e:
+                errors[str(field.verbose_name)] = ' '.join(e.messages)
+        if errors:
+            raise RowError(errors)
+        return data
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def write_chunk(self, rows):
+        """
+            Upsert a chunk of (row number, data) in one transaction. When the database refuses
+            the chunk, its rows are written one at a time to find the bad ones.
+        """
+        try:
+            with transaction.atomic():
+                created, updated = self.save_rows(rows)
+        except (DatabaseError, RowError) as e:
+            if len(rows) == 1:
+                errors = e.errors if isinstance(e, RowError) else {'detail': str(e).strip()}
+                self.add_error(rows[0][0], errors)
+                return
+            for row in rows:
+                self.write_chunk([row])
+            return
+        self.created += created
+        self.updated += updated
+
+    def save_rows(self, rows):
+        model = self.model
+        pk_name = model._meta.pk.name
+        ids = [data[model._meta.pk] for _, data in rows if data.get(model._meta.pk) is not None]
+        existing = model._base_manager.in_bulk(ids) if ids else {}
+        if any(data.get(model._meta.pk) not in (None, *existing) for _, data in rows):
+            raise RowError({'ID': f'No {model._meta.verbose_name} with this ID.'})
+
+        new_objs, updated_objs, relations = [], [], []
+        for _, data in rows:
+            pk = data.get(model._meta.pk)
+            obj = existing[pk] if pk is not None else model()
+            for field, value in data.items():
+                if field.many_to_many:
+                    relations.append((obj, field, value))
+                elif not field.primary_key:
+                    setattr(obj, field.attname, value)
+            if pk is None:
+                obj.created_by = obj.updated_by = self.user
+                new_objs.append(obj)
+            else:
+                obj.updated_by = self.user or obj.updated_by
+                updated_objs.append(obj)
+
+        fields = {field for _, data in rows for field in data if not field.many_to_many and not field.primary_key}
+        update_fields = [field.name for field in fields] + ['updated_by'] + [
+            field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)
+        ]
+
+        if new_objs:
+            model.objects.bulk_create(new_objs)
+        if updated_objs:
+            model.objects.bulk_create(
+                updated_objs, update_conflicts=True, unique_fields=[pk_name], update_fields=update_fields,
+            )
+
+        for field in {field for _, field, _ in relations}:
+            through = getattr(model, field.name).through
+            source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+            objs = [obj for obj, relation, _ in relations if relation is field]
+            through.objects.filter(**{f'{source}__in': [obj.pk for obj in objs]}).delete()
+            through.objects.bulk_create([
+                through(**{f'{source}_id': obj.pk, f'{target}_id': value})
+                for obj, relation, values in relations if relation is field for value in set(values)
+            ])
+
+        pks = [obj.pk for obj in new_objs + updated_objs]
+        transaction.on_commit(lambda: post_bulk_update.send(sender=model, pks=pks))
+        return len(new_objs), len(updated_objs)
+
+    def run(self, file):
+        """
+            Function to import the first sheet of the workbook.
+
+            :param file: The xlsx file.
+            :return: dict with the created, updated and failed counts and the errors by row number.
+        """
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            columns = self.map_columns(next(rows, ()))
+
+            chunk = []
+            for row_number, values in enumerate(rows, start=2):
+                if not any(value not in (None, '') for value in values):
+                    continue
+                try:
+                    chunk.append((row_number, self.build_row(columns, values)))
+                except RowError as e:
+                    self.add_error(row_number, e.errors)
+                if len(chunk) >= self.chunk_size:
+                    self.write_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.write_chunk(chunk)
+        finally:
+            wb.close()
+
+        bump_model_version(self.model)
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
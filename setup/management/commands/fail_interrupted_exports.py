@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from setup.export import fail_stale_export_jobs
+
+
+class Command(BaseCommand):
+    help = 'To mark the running export jobs whose worker stopped (no heartbeat) as failed'
+
+    def handle(self, *args, **options):
+        count = fail_stale_export_jobs()
+
+        self.stdout.write(f'Marked {count} interrupted export jobs as failed.')
@@ -0,0 +1,27 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from setup.renditions import RENDITION_FIELDS
+from setup.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'To generate the sized image renditions, only of the images missing them unless --all is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Generate the renditions of every image again')
+
+    def handle(self, *args, **options):
+        for label, field_name in RENDITION_FIELDS.items():
+            model = apps.get_model(label)
+            rows = model._base_manager.exclude(**{f'{field_name}__isnull': True}).exclude(
+                **{field_name: ''}
+            ).values_list('pk', field_name, 'renditions')
+
+            count = 0
+            for pk, name, renditions in rows.iterator():
+                if options['all'] or (renditions or {}).get('source') != name:
+                    generate_renditions(label, pk)
+                    count += 1
+
+            self.stdout.write(f'Generated the renditions of {count} {model._meta.verbose_name_plural}.')
@@ -0,0 +1,43 @@
+import logging
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from setup.export import EXPORT_WORKER_POLL_INTERVAL
+from setup.export import claim_export_job
+from setup.export import fail_stale_export_jobs
+from setup.export import run_export_job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'To run the queued export jobs, one at a time, outside of the web workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no job is pending')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Export worker {worker} started.')
+
+        while True:
+            fail_stale_export_jobs()
+            job = claim_export_job(worker)
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(EXPORT_WORKER_POLL_INTERVAL)
+                continue
+
+            try:
+                run_export_job(job)
+            except Exception:
+                # Recorded on the job, the worker goes on with the next one
+                logger.exception('Export job %s failed', job.pk)
+            finally:
+                # Like after a request, a broken or expired connection is not reused
+                close_old_connections()
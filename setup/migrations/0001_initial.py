@@ -0,0 +1,46 @@
+# Generated by Django 4.2.4 on 2026-10-18 17:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now_add=True, verbose_name='Updated At')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Deleted')),
+                ('deleted_at', models.DateTimeField(auto_now=True, verbose_name='Deleted At')),
+                ('model', models.CharField(max_length=100, verbose_name='Model')),
+                ('export_format', models.CharField(default='xlsx', max_length=10, verbose_name='Format')),
+                ('filters', models.JSONField(blank=True, default=dict, verbose_name='Filters')),
+                ('selected_fields', models.JSONField(blank=True, default=list, verbose_name='Selected Fields')),
+                ('include_deleted', models.BooleanField(default=False, verbose_name='Include Deleted')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10, verbose_name='Status')),
+                ('total_rows', models.IntegerField(default=0, verbose_name='Total Rows')),
+                ('processed_rows', models.IntegerField(default=0, verbose_name='Processed Rows')),
+                ('file', models.FileField(blank=True, null=True, upload_to='exports/', verbose_name='File')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Error')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL, verbose_name='Created By')),
+                ('deleted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_deleted_by', to=settings.AUTH_USER_MODEL, verbose_name='Deleted By')),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL, verbose_name='Updated By')),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.4 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Heartbeat At'),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='query',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Query'),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='worker',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Worker'),
+        ),
+    ]
@@ -44,3 +44,45 @@
 #     class Meta:
 #         abstract = True
 #         ordering = ['-updated_at']
+
+from django.db import models
+
+from users.models.base_model import BaseModel
+
+
+class ExportJob(BaseModel):
+    """
+        Export run by the export worker (run_export_worker), the file is kept in the storage until downloaded.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    model = models.CharField(max_length=100, verbose_name='Model')
+    export_format = models.CharField(max_length=10, default='xlsx', verbose_name='Format')
+    filters = models.JSONField(default=dict, blank=True, verbose_name='Filters')
+    selected_fields = models.JSONField(default=list, blank=True, verbose_name='Selected Fields')
+    include_deleted = models.BooleanField(default=False, verbose_name='Include Deleted')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True,
+                              verbose_name='Status')
+    total_rows = models.IntegerField(default=0, verbose_name='Total Rows')
+    processed_rows = models.IntegerField(default=0, verbose_name='Processed Rows')
+    file = models.FileField(upload_to='exports/', blank=True, null=True, verbose_name='File')
+    error = models.TextField(blank=True, null=True, verbose_name='Error')
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name='Started At')
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='Finished At')
+    # The pickled query of the filtered queryset, run by the worker
+    query = models.BinaryField(blank=True, null=True, editable=False, verbose_name='Query')
+    worker = models.CharField(max_length=255, blank=True, null=True, verbose_name='Worker')
+    heartbeat_at = models.DateTimeField(blank=True, null=True, verbose_name='Heartbeat At')
+
+    def __str__(self):
+        return f'{self.model} export ({self.status})'
@@ -1,15 +1,57 @@
+import json
+import datetime
+from base64 import urlsafe_b64decode
+from base64 import urlsafe_b64encode
+
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import remove_query_param
+from rest_framework.utils.urls import replace_query_param
+from django.conf import settings
 from django.core.paginator import InvalidPage
+from django.core.paginator import Page
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.db.models import Q
+from django.db import connections
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder cuts datetimes to milliseconds, the cursor needs the exact value
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
 
 
 class CustomPagination(PageNumberPagination):
+    """
+        Page number pagination with an optional cursor (keyset) mode.
+
+        The cursor mode is used when the request has a `cursor` parameter, asks for
+        `pagination=cursor`, or the view sets `pagination_mode = 'cursor'`. Pages are keyed
+        on (first ordering field, pk), so every page costs the same whatever its depth
+        and the total count is skipped.
+
+        The total of the page mode follows `count_strategy`, set on the view, by the `count`
+        parameter or by the PAGINATION_COUNT_STRATEGY setting:
+            exact : COUNT(*) of the whole queryset.
+            capped : counts up to `count_cap` rows, larger totals are reported as "N+".
+            estimated : planner row estimate for unfiltered tables, capped otherwise.
+    """
     default_limit = 10  # Set your default page size here
     max_limit = 100  # Set the maximum allowed page size here
     limit_query_param = 'limit'
     offset_query_param = 'offset'
     page_size_query_param = 'per_page'
+    cursor_query_param = 'cursor'
+    pagination_mode_query_param = 'pagination'
+    invalid_cursor_message = 'Invalid cursor'
+    count_query_param = 'count'
+    count_strategies = ('exact', 'capped', 'estimated')
+    count_strategy = getattr(settings, 'PAGINATION_COUNT_STRATEGY', 'exact')
+    count_cap = getattr(settings, 'PAGINATION_COUNT_CAP', 1000)
 
     def get_limit(self, request):
         if self.limit_query_param:
@@ -44,6 +86,11 @@ class CustomPagination(PageNumberPagination):
         return queryset
 
     def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.is_cursor_mode(request, view) # noqa
+        if self.cursor_mode:
+            return self.paginate_cursor(queryset, request)
+
+        self.count_strategy = self.get_count_strategy(request, view) # noqa
         self.total_count = self.get_total_count(queryset) # noqa
 
         self.limit = self.get_limit(request) # noqa
@@ -55,6 +102,12 @@ class CustomPagination(PageNumberPagination):
             return None
 
         self.offset = self.get_offset(request) # noqa
+        self.request = request
+
+        if self.total_approximate:
+            self.page = self.get_uncounted_page(request, queryset)
+            self.display_page_controls = self.template is not None
+            return list(self.page)
 
         if self.total_count == 0 or self.offset > self.total_count:
             paginator = self.django_paginator_class([], self.page_size)
@@ -62,6 +115,8 @@ class CustomPagination(PageNumberPagination):
             paginator = self.django_paginator_class(
                 self.get_query(request, queryset), self.page_size
             )
+            # Already counted, the paginator must not run its own COUNT(*)
+            paginator.count = self.get_query_count(request)
 
         page_number = self.get_page_number(request, paginator)
 
@@ -77,9 +132,44 @@ class CustomPagination(PageNumberPagination):
             # The browsable API should display pagination controls.
             self.display_page_controls = True
 
-        self.request = request
         return list(self.page)
 
+    def get_query_count(self, request):
+        if self.limit_query_param in request.query_params:
+            return max(min(self.total_count - self.offset, self.limit), 0)
+        return self.total_count
+
+    def get_uncounted_page(self, request, queryset):
+        """
+            Page of a queryset whose total is approximate.
+            One extra row is fetched to know whether a next page exists.
+        """
+        page_number = request.query_params.get(self.page_query_param, 1)
+        try:
+            number = int(page_number)
+            if number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message='That page number is not a valid integer'
+            ))
+
+        bottom = (number - 1) * self.page_size
+        rows = list(self.get_query(request, queryset)[bottom:bottom + self.page_size + 1])
+        if not rows and number > 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message='That page contains no results'
+            ))
+
+        paginator = self.django_paginator_class([], self.page_size)
+        if len(rows) > self.page_size:
+            paginator.count = max(self.total_count, bottom + len(rows))
+        else:
+            # The last page was reached, so the total is known
+            paginator.count = self.total_count = bottom + len(rows) # noqa
+            self.total_approximate = False # noqa
+        return Page(rows[:self.page_size], number, paginator)
+
     def get_total_pages(self):
         if self.limit is None:
             return None
@@ -92,16 +182,189 @@ class CustomPagination(PageNumberPagination):
             total_pages = 1
         return total_pages
 
+    def get_count_strategy(self, request, view):
+        if request.query_params.get(self.page_size_query_param) == '-1':
+            # Every row is fetched anyway
+            return 'exact'
+        strategy = (
+            request.query_params.get(self.count_query_param) or
+            getattr(view, 'count_strategy', None) or
+            self.count_strategy
+        )
+        return strategy if strategy in self.count_strategies else 'exact'
+
     def get_total_count(self, queryset):
+        self.total_approximate = False # noqa
         try:
+            if self.count_strategy == 'estimated':
+                estimate = self.get_estimated_count(queryset)
+                if estimate is not None and estimate > self.count_cap:
+                    self.total_approximate = True # noqa
+                    return estimate
+
+            if self.count_strategy in ('capped', 'estimated'):
+                count = queryset.order_by()[:self.count_cap + 1].count()
+                if count > self.count_cap:
+                    self.total_approximate = True # noqa
+                    return self.count_cap
+                return count
+
             return queryset.count()
         except Exception as e:
             return len(queryset)
 
+    def get_estimated_count(self, queryset):
+        """
+            Row estimate of the PostgreSQL planner, only for a queryset that is not filtered
+            beyond its default manager. None when there is no usable estimate.
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.distinct:
+            return None
+
+        unfiltered = queryset.model._default_manager.all()
+        if queryset.query.where != unfiltered.query.where:
+            return None
+
+        sql, params = unfiltered.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def get_total_label(self):
+        if not self.total_approximate:
+            return str(self.total_count)
+        if self.total_count == self.count_cap:
+            return f'{self.total_count}+'
+        return f'~{self.total_count}'
+
+    def is_cursor_mode(self, request, view):
+        if self.cursor_query_param in request.query_params:
+            return True
+        mode = request.query_params.get(self.pagination_mode_query_param) or getattr(view, 'pagination_mode', 'page')
+        return mode == 'cursor'
+
+    def get_cursor_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        # No unbounded pages in cursor mode, per_page=-1 gets the largest page
+        return min(size, self.max_limit) if size > 0 else self.max_limit
+
+    def get_cursor_ordering(self, queryset):
+        """
+            The first ordering field of the queryset and its direction, pk when there is none.
+        """
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        field = ordering[0] if ordering and isinstance(ordering[0], str) and ordering[0] != '?' else '-pk'
+        descending = field.startswith('-')
+        field = field.lstrip('-')
+        if field in ('pk', queryset.model._meta.pk.name):
+            field = None
+        return field, descending
+
+    def encode_cursor(self, row, field, direction):
+        position = {
+            'v': self.get_row_value(row, '_cursor_value') if field else None,
+            'id': self.get_row_value(row, 'pk'),
+            'd': direction,
+        }
+        cursor = urlsafe_b64encode(json.dumps(position, cls=CursorEncoder).encode()).decode()
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        url = remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(cursor.encode()))
+            if not isinstance(position, dict) or {'v', 'id', 'd'} - set(position):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def get_row_value(row, name):
+        if isinstance(row, dict):
+            return row.get(name, row.get('id')) if name == 'pk' else row.get(name)
+        return getattr(row, name)
+
+    def paginate_cursor(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_cursor_page_size(request)
+        self.next_link = self.previous_link = None # noqa
+
+        field, descending = self.get_cursor_ordering(queryset)
+        position = self.decode_cursor(request)
+        reverse = position is not None and position['d'] == 'p'
+
+        # A previous page walks the ordering backwards and is flipped afterwards
+        backwards = descending != reverse
+        lookup = 'lt' if backwards else 'gt'
+        pk_order = '-pk' if backwards else 'pk'
+
+        if field:
+            queryset = queryset.annotate(_cursor_value=F(field))
+            order = F(field).desc if backwards else F(field).asc
+            # Nulls stay at the end of the forward ordering
+            queryset = queryset.order_by(order(nulls_first=True) if reverse else order(nulls_last=True), pk_order)
+        else:
+            queryset = queryset.order_by(pk_order)
+
+        if position is not None:
+            queryset = queryset.filter(self.get_cursor_filter(field, lookup, position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if rows:
+            if has_more or reverse:
+                self.next_link = self.encode_cursor(rows[-1], field, 'n') # noqa
+            if position is not None and (has_more or not reverse):
+                self.previous_link = self.encode_cursor(rows[0], field, 'p') # noqa
+        return rows
+
+    @staticmethod
+    def get_cursor_filter(field, lookup, position, reverse):
+        value, pk = position['v'], position['id']
+        if not field:
+            return Q(**{f'pk__{lookup}': pk})
+
+        if value is None:
+            query = Q(**{f'{field}__isnull': True, f'pk__{lookup}': pk})
+            if reverse:
+                query |= Q(**{f'{field}__isnull': False})
+        else:
+            query = Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': pk})
+            if not reverse:
+                query |= Q(**{f'{field}__isnull': True})
+        return query
+
     def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return Response({
+                'total_pages': None,
+                'total': None,  # Not counted in cursor mode
+                'results': data,
+                'previous': self.previous_link,
+                'next': self.next_link,
+            })
+
         return Response({
             'total_pages': self.get_total_pages(),
             'total': self.total_count,  # Here is your total count
+            'total_approximate': self.total_approximate,
+            'total_label': self.get_total_label(),
             'results': data,
             'previous': self.get_previous_link(),
             'next': self.get_next_link(),
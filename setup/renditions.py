@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from setup.cache import bump_model_version
+from setup.images import render_image
+from setup.tasks import run_in_background
+from setup.utils import presign_urls
+
+logger = logging.getLogger(__name__)
+
+IMAGE_RENDITION_WIDTHS = getattr(settings, 'IMAGE_RENDITION_WIDTHS', (320, 640, 1024, 1600))
+IMAGE_RENDITION_FORMATS = getattr(settings, 'IMAGE_RENDITION_FORMATS', ('webp', 'jpeg'))
+# 0 encodes on the background thread itself
+IMAGE_RENDITION_PROCESSES = getattr(settings, 'IMAGE_RENDITION_PROCESSES', 1)
+
+# Models with renditions and their image field
+RENDITION_FIELDS = {
+    'product.productimage': 'image',
+    'product.collection': 'feature_image',
+    'product.lookbook': 'feature_image',
+    'masterdata.brand': 'logo',
+    'customer.reviewimage': 'file',
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, forking a threaded gunicorn worker is not safe
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_RENDITION_PROCESSES, mp_context=get_context('spawn'))
+        return _pool
+
+
+def render(data):
+    if not IMAGE_RENDITION_PROCESSES:
+        return render_image(data, IMAGE_RENDITION_WIDTHS, IMAGE_RENDITION_FORMATS)
+
+    global _pool
+    try:
+        return get_process_pool().submit(render_image, data, IMAGE_RENDITION_WIDTHS, IMAGE_RENDITION_FORMATS).result()
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool = None
+        raise
+
+
+def rendition_name(name, width, image_format):
+    stem, _ = os.path.splitext(name)
+    extension = 'jpg' if image_format == 'jpeg' else image_format
+    return f'renditions/{stem}_{width}w.{extension}'
+
+
+def generate_renditions(model_label, pk):
+    """
+        Function to generate the sized renditions of the image of a row.
+
+        The image is resized and encoded in the rendition process pool, the files are
+        stored next to it under `renditions/` and their names saved in `renditions`.
+        Files that are not images get an empty set of sizes.
+
+        :param model_label: The label of a model of RENDITION_FIELDS, eg: product.productimage
+        :param pk: The primary key of the row.
+    """
+    model = apps.get_model(model_label)
+    field_name = RENDITION_FIELDS[model._meta.label_lower]
+    instance = model._base_manager.filter(pk=pk).first()
+    file = getattr(instance, field_name, None)
+    if not file:
+        return
+
+    source = file.name
+    with file.storage.open(source, 'rb') as original:
+        data = original.read()
+    try:
+        rendered = render(data)
+    except OSError as e:
+        # Not an image, eg: a document attached to a review
+        logger.warning('No renditions for %s %s: %s', model_label, pk, e)
+        rendered = []
+
+    sizes = {}
+    for width, image_format, content in rendered:
+        name = file.storage.save(rendition_name(source, width, image_format), ContentFile(content))
+        sizes.setdefault(image_format, {})[str(width)] = name
+
+    fields = {'renditions': {'source': source, 'sizes': sizes}}
+    if 'thumbnail' in [field.name for field in model._meta.fields] and sizes.get('jpeg'):
+        # The smallest JPEG stands in for the thumbnail of the synchronous version
+        fields['thumbnail'] = sizes['jpeg'][min(sizes['jpeg'], key=int)]
+
+    # Compare and swap, skipped when the image was replaced (the task of the new image renders
+    # that one) or another task of the same image saved its renditions meanwhile. The files
+    # of the losing task are deleted, those of the winner stay referenced
+    updated = model._base_manager.filter(
+        pk=pk, renditions=instance.renditions, **{field_name: source}
+    ).update(**fields)
+    stale = get_rendition_names(instance.renditions) if updated else get_rendition_names(fields['renditions'])
+    for name in stale:
+        file.storage.delete(name)
+    if updated:
+        bump_model_version(model)
+
+
+def get_rendition_names(renditions):
+    return [name for names in (renditions or {}).get('sizes', {}).values() for name in names.values()]
+
+
+def queue_renditions(sender, instance, **kwargs):
+    """
+        post_save receiver of the RENDITION_FIELDS models, queues the renditions of a new image.
+    """
+    file = getattr(instance, RENDITION_FIELDS[sender._meta.label_lower])
+    if file and (instance.renditions or {}).get('source') != file.name:
+        run_in_background(generate_renditions, sender._meta.label_lower, instance.pk)
+
+
+def rendition_urls(instance):
+    """
+        The urls of the renditions of the instance by format and width,
+        eg: {'webp': {'320': url, '640': url}, 'jpeg': {...}}
+    """
+    storage = getattr(instance, RENDITION_FIELDS[instance._meta.label_lower]).storage
+    sizes = (instance.renditions or {}).get('sizes', {})
+    urls = presign_urls(storage, [name for names in sizes.values() for name in names.values()])
+    return {
+        image_format: {width: urls[name] for width, name in names.items()}
+        for image_format, names in sizes.items()
+    }
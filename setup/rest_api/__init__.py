@@ -1 +1,5 @@
-from .import_data import ImportTableData
\ No newline at end of file
+from .import_data import ImportTableData
+from .cache_stats import CacheStatsView
+from .uploads import UploadIntentView
+from .uploads import UploadConfirmView
+from .export_jobs import ExportJobViewSet
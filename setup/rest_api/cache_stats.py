@@ -0,0 +1,25 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework import status
+from drf_spectacular.utils import extend_schema
+
+from setup.permissions import IsSuperUser
+from setup.cache import get_cache_stats
+
+
+@extend_schema(tags=["Setup"])
+class CacheStatsView(APIView):
+    """
+        Get the hit and miss counters of the application caches.
+
+        Parameters:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            Response: The hits, misses and hit rate of every cache, summed over the workers.
+    """
+    permission_classes = (IsAuthenticated, IsSuperUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_cache_stats(), status=status.HTTP_200_OK)
@@ -0,0 +1,44 @@
+from django.shortcuts import redirect
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.mixins import ListModelMixin
+from rest_framework.mixins import RetrieveModelMixin
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+from drf_spectacular.utils import extend_schema
+
+from setup.models import ExportJob
+from setup.permissions import IsSuperUser
+from setup.serializer import ExportJobSerializer
+
+
+@extend_schema(tags=["Setup"])
+class ExportJobViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin):
+    """
+        API to follow the export jobs of the admin user and download their files.
+    """
+    permission_classes = (IsAuthenticated, IsSuperUser,)
+    queryset = ExportJob.objects.all().order_by('-id')
+    serializer_class = ExportJobSerializer
+
+    def get_queryset(self):
+        return self.queryset.filter(created_by=self.request.user)
+
+    @action(detail=True, methods=['GET'])
+    def download(self, request, *args, **kwargs):
+        """
+            Download the file of a finished export job
+
+            Parameters:
+                request (HttpRequest): The HTTP request object.
+
+            Returns:
+                Response: A redirect to the file in the storage, the web workers never carry it.
+        """
+        job = self.get_object()
+        if job.status != ExportJob.DONE or not job.file:
+            return Response({
+                'message': f'The export is {job.get_status_display().lower()}.'
+            }, status=status.HTTP_409_CONFLICT)
+        return redirect(job.file.url)
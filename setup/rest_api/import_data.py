@@ -1,14 +1,32 @@
-import openpyxl
-
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from django.conf import settings
 from django.apps import apps
+from django.core.exceptions import ValidationError
+from drf_spectacular.utils import extend_schema
+
+from setup.imports import TableImport
+from setup.permissions import IsSuperUser
 from setup.serializer import ImportSerializer
+from users.models.base_model import BaseModel
 
 
+@extend_schema(tags=["Setup"], request=ImportSerializer)
 class ImportTableData(APIView):
+    """
+        Import the rows of an xlsx sheet laid out like the export of the table.
+
+        Parameters:
+            request (HttpRequest): The HTTP request object.
+        Data:
+            model (char): The name of the model, eg: Products.
+            import_file (file): The xlsx file, the header row holds the column names of the export.
+
+        Returns:
+            Response: The created, updated and failed counts and the errors of each failed row.
+    """
+    permission_classes = (IsAuthenticated, IsSuperUser,)
 
     def post(self, request):
         serializer = ImportSerializer(data=request.data)
@@ -20,26 +38,23 @@ class ImportTableData(APIView):
         model_class = None
 
         for model in apps.get_models():
-            if model_name == model.__name__:
+            if model_name == model.__name__ and issubclass(model, BaseModel):
                 model_class = model
                 break
 
-        print('===================================')
-        print('model: ', model_class.objects.all().count())
-        print('File: ', file)
-        print('===================================')
+        if model_class is None:
+            return Response({
+                'message': f'No table named {model_name}.'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-
-        wb = openpyxl.load_workbook(file)
-        sheet = wb.active
-
-        for row in sheet.iter_rows(values_only=True, min_row=2):
-            print('--------------------------------------------')
-            print('row : ', row)
-            print('--------------------------------------------')
+        try:
+            report = TableImport(model_class, user=request.user).run(file)
+        except ValidationError as e:
+            return Response({
+                'message': ' '.join(e.messages)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
-            'message': 'Success'
+            'message': 'Success',
+            **report
         }, status=status.HTTP_200_OK)
-
-
@@ -0,0 +1,62 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework import status
+from drf_spectacular.utils import extend_schema
+
+from setup.serializer import UploadIntentSerializer
+from setup.serializer import UploadConfirmSerializer
+from setup.direct_uploads import create_upload_intent
+from setup.direct_uploads import confirm_upload
+
+
+@extend_schema(tags=["Setup"], request=UploadIntentSerializer)
+class UploadIntentView(APIView):
+    """
+        Get a presigned POST to upload a file straight to storage.
+
+        Parameters:
+            request (HttpRequest): The HTTP request object.
+        Data:
+            target (char): What the file is, product_image, variant_image, review_image, return_bill or hero_image.
+            object_id (int): The product, variant, review, return or hero section the file is for.
+            filename (char): The name of the file.
+            content_type (char): The content type of the file.
+            size (int): The size of the file in bytes.
+
+        Returns:
+            Response: The `upload_id` to confirm with, and the `url` and form `fields` to POST the file to.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = UploadIntentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        intent = create_upload_intent(user=request.user, **serializer.validated_data)
+        return Response(intent, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(tags=["Setup"], request=UploadConfirmSerializer)
+class UploadConfirmView(APIView):
+    """
+        Attach a file uploaded with a presigned POST to its object, the renditions are generated in the background.
+
+        Parameters:
+            request (HttpRequest): The HTTP request object.
+        Data:
+            upload_id (char): The `upload_id` of the upload intent.
+            alt_text (char): Alt text of product and variant images.
+
+        Returns:
+            Response: The id of the object and the url of the file.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = UploadConfirmSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        obj, file = confirm_upload(user=request.user, **serializer.validated_data)
+        return Response({
+            'message': 'Successfully uploaded.',
+            'data': {'id': obj.pk, 'name': file.name, 'url': file.url},
+        }, status=status.HTTP_200_OK)
@@ -1,10 +1,172 @@
+import copy
+import sys
+
+from django.core.exceptions import ValidationError
+from django.db.models import Manager
+from django.db.models import Prefetch
 from rest_framework import serializers
 
+from setup.cache import reference_cache
+from setup.direct_uploads import UPLOAD_TARGETS
+from setup.models import ExportJob
+from setup.cache import prime_references
+from setup.renditions import rendition_urls
+
 
 class ImportSerializer(serializers.Serializer):
     model = serializers.CharField(required=True)
     import_file = serializers.FileField(required=True)
 
 
+class ExportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    url = serializers.SerializerMethodField()
+
+    def get_progress(self, attrs):
+        if attrs.status == ExportJob.DONE:
+            return 100
+        return int(attrs.processed_rows * 100 / attrs.total_rows) if attrs.total_rows else 0
+
+    def get_url(self, attrs):
+        return attrs.file.url if attrs.status == ExportJob.DONE and attrs.file else None
+
+    class Meta:
+        model = ExportJob
+        fields = (
+            'id',
+            'model',
+            'export_format',
+            'filters',
+            'selected_fields',
+            'status',
+            'total_rows',
+            'processed_rows',
+            'progress',
+            'url',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        )
+
+
+class UploadIntentSerializer(serializers.Serializer):
+    target = serializers.ChoiceField(choices=list(UPLOAD_TARGETS))
+    object_id = serializers.IntegerField()
+    filename = serializers.CharField(max_length=200)
+    content_type = serializers.CharField(max_length=100)
+    size = serializers.IntegerField(min_value=1)
+
+
+class UploadConfirmSerializer(serializers.Serializer):
+    upload_id = serializers.CharField()
+    alt_text = serializers.CharField(max_length=255, required=False, default='', allow_blank=True)
+
+
+class ReferenceRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+        Primary key field that resolves reference models (brands, categories, taxes...)
+        from the reference cache instead of a query per value. Other models and
+        filtered querysets are looked up as usual.
+
+        Set it as `serializer_related_field` of a ModelSerializer.
+    """
+
+    def to_internal_value(self, data):
+        queryset = self.get_queryset()
+        model = queryset.model
+        cache = reference_cache(model)
+        if cache is None or self.pk_field is not None or \
+                queryset.query.where != model._default_manager.all().query.where:
+            return super().to_internal_value(data)
+
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            obj = cache.get_object(model._meta.pk.to_python(data))
+        except (TypeError, ValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        # The cached instance is shared by the worker
+        return copy.copy(obj)
+
+
+class ReferenceListSerializer(serializers.ListSerializer):
+    """
+        List serializer that fills the reference foreign keys (brand, tax, parent
+        category...) of the rows from the reference cache before rendering them.
+
+        Set it as `list_serializer_class` in the Meta of a ModelSerializer.
+    """
+
+    def to_representation(self, data):
+        rows = data.all() if isinstance(data, Manager) else data
+        model = self.child.Meta.model
+        fields = [
+            field.name for field in model._meta.concrete_fields
+            if field.many_to_one and reference_cache(field.related_model)
+        ]
+        return super().to_representation(prime_references(rows, *fields))
+
+
+class RenditionsField(serializers.Field):
+    """
+        Read only urls of the sized image renditions of the instance, by format and width.
+        Empty until the background pipeline has rendered the image.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return rendition_urls(instance)
+
+
+def nest_lookup(relation, lookup):
+    if isinstance(lookup, Prefetch):
+        return Prefetch(f'{relation}__{lookup.prefetch_through}', queryset=lookup.queryset)
+    return f'{relation}__{lookup}'
+
+
+def prefetch_lookups(serializer_class, model):
+    """
+        Function to expand the `prefetch_plan` of a serializer into queryset lookups.
+
+        The plan lists the relations the serializer reads, eg:
+            prefetch_plan = {
+                'select_related': ('created_by', 'updated_by'),
+                'prefetch_related': ('categories',),
+                'nested': {'brand': BrandModelSerializerGET, 'product_images': 'ProductImageModelSerializer'},
+            }
+        `nested` maps a relation to the serializer rendering it (the class, or its name in the
+        module of the serializer), whose own plan is followed under the relation: joined for
+        a foreign key, prefetched for a to many relation with the joins in the prefetch query.
+
+        :param serializer_class: The serializer rendering the rows.
+        :param model: The model of the rows.
+        :return: tuple of the select_related and the prefetch_related lookups.
+    """
+    plan = getattr(serializer_class, 'prefetch_plan', {})
+    select_related = list(plan.get('select_related', ()))
+    prefetch_related = list(plan.get('prefetch_related', ()))
+
+    for relation, nested in plan.get('nested', {}).items():
+        if isinstance(nested, str):
+            nested = getattr(sys.modules[serializer_class.__module__], nested)
+        field = model._meta.get_field(relation)
+        nested_select, nested_prefetch = prefetch_lookups(nested, field.related_model)
 
+        if field.many_to_many or field.one_to_many:
+            # The related manager filters the rows, eg: the deleted ones are left out
+            queryset = field.related_model._default_manager.all()
+            if nested_select:
+                queryset = queryset.select_related(*nested_select)
+            prefetch_related.append(Prefetch(relation, queryset=queryset))
+        else:
+            select_related += [relation] + [f'{relation}__{lookup}' for lookup in nested_select]
+        prefetch_related += [nest_lookup(relation, lookup) for lookup in nested_prefetch]
 
+    return select_related, prefetch_related
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent on commit after rows are written with bulk statements (imports, bulk actions), with
+# the `pks` of the rows. Those skip save() and the post_save receivers, the models refresh
+# what they derive from the rows on this signal instead
+post_bulk_update = Signal()
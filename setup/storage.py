@@ -0,0 +1,66 @@
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from setup.utils import cached_presigned_url
+from setup.utils import get_s3_client
+
+
+class CachedUrlS3Storage(S3Boto3Storage):
+    """
+        S3 storage which signs urls with the shared client and reuses them.
+
+        A listing asks for the url of every image it renders, signing each of them
+        again on every request costs more than the query. Signed urls are kept in
+        the process until PRESIGNED_URL_REFRESH_MARGIN seconds before they expire.
+        Urls with extra parameters or another http method are signed as before.
+    """
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        if parameters or http_method or self.custom_domain or not self.querystring_auth:
+            return super().url(name, parameters, expire, http_method)
+        return self.urls([name], expire)[name]
+
+    def urls(self, names, expire=None):
+        """
+            Function to get the presigned urls of many files, the missing ones are signed in one go.
+
+            :param names: The names of the files.
+            :param expire: The expiration time of the urls in seconds.
+            :return: dict of name and url.
+        """
+        if self.custom_domain or not self.querystring_auth:
+            return {name: super(CachedUrlS3Storage, self).url(name) for name in names}
+
+        expire = self.querystring_expire if expire is None else expire
+        client = get_s3_client()
+
+        def sign(key):
+            return client.generate_presigned_url(
+                'get_object', Params={'Bucket': self.bucket_name, 'Key': key}, ExpiresIn=expire
+            )
+
+        urls = {}
+        for name in names:
+            key = self._normalize_name(clean_name(name))
+            urls[name] = cached_presigned_url(
+                (self.bucket_name, key, expire), lambda key=key: sign(key), expire
+            )
+        return urls
+
+    def presigned_post(self, name, content_type, max_size, expire):
+        """
+            Function to get a presigned POST the client uploads a file straight to the bucket with.
+
+            :param name: The name the file is stored as.
+            :param content_type: The only content type the policy accepts.
+            :param max_size: The largest file the policy accepts, in bytes.
+            :param expire: The expiration time of the policy in seconds.
+            :return: dict with the `url` to POST to and the form `fields` to send with the file.
+        """
+        return get_s3_client().generate_presigned_post(
+            self.bucket_name,
+            self._normalize_name(clean_name(name)),
+            Fields={'Content-Type': content_type},
+            Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, max_size]],
+            ExpiresIn=expire,
+        )
@@ -0,0 +1,43 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_THREADS = getattr(settings, 'BACKGROUND_THREADS', 2)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BACKGROUND_THREADS, thread_name_prefix='background')
+        return _executor
+
+
+def run_task(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        # Every background thread has its own connections
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+        Function to run `func` on the background threads of the worker, off the request path.
+
+        The task is queued once the current transaction commits, so it sees the rows the
+        request wrote. Tasks are not persisted, work lost on a restart is picked up by the
+        backfill commands (eg: generate_renditions).
+    """
+    transaction.on_commit(lambda: get_executor().submit(run_task, func, *args, **kwargs))
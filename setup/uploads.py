@@ -0,0 +1,107 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Threads of the worker shared by every upload, and how many of them one request may use
+UPLOAD_THREADS = getattr(settings, 'UPLOAD_THREADS', 8)
+UPLOAD_CONCURRENCY = getattr(settings, 'UPLOAD_CONCURRENCY', 4)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=UPLOAD_THREADS, thread_name_prefix='upload')
+        return _executor
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception('Could not delete the partial upload %s', name)
+
+
+def upload_files(field, files, instance=None, concurrency=None):
+    """
+        Function to save files to the storage of a model file field concurrently.
+
+        At most `concurrency` files of the call are in flight at a time, on the upload
+        threads shared by the worker. Either every file is saved or none: when one fails
+        the files already saved are deleted and a ValidationError is raised.
+
+        :param field: The model FileField, eg: ProductImage._meta.get_field('image').
+        :param files: The uploaded files.
+        :param instance: Instance passed to the `upload_to` of the field.
+        :param concurrency: Maximum parallel uploads, defaults to UPLOAD_CONCURRENCY.
+        :return: list of the saved names, in the order of the files.
+    """
+    files = list(files)
+    if not files:
+        return []
+
+    storage = field.storage
+    instance = instance if instance is not None else field.model()
+    concurrency = max(1, min(concurrency or UPLOAD_CONCURRENCY, len(files)))
+
+    pending = iter(enumerate(files))
+    lock = threading.Lock()
+    names = [None] * len(files)
+    errors = []
+
+    def upload():
+        # Each runner takes the next file until none are left or one failed
+        while True:
+            with lock:
+                item = None if errors else next(pending, None)
+            if item is None:
+                return
+            index, file = item
+            try:
+                name = field.generate_filename(instance, file.name)
+                names[index] = storage.save(name, file, max_length=field.max_length)
+            except Exception as e:
+                logger.exception('Upload of %s failed', file.name)
+                with lock:
+                    errors.append((file.name, e))
+
+    executor = get_executor()
+    futures = [executor.submit(upload) for _ in range(concurrency)]
+    for future in futures:
+        future.result()
+
+    if errors:
+        delete_files(storage, [name for name in names if name])
+        raise serializers.ValidationError({
+            'images': [f'Could not upload {name}, please try again.' for name, _ in errors]
+        })
+    return names
+
+
+@contextmanager
+def uploaded_files(field, files, instance=None, concurrency=None):
+    """
+        Context manager uploading the files, then running the block in a transaction.
+
+        The saved names are yielded to the block. If the block raises, the transaction
+        rolls back and the uploaded files are deleted, so no row points to a missing file
+        and no file is left without a row.
+    """
+    names = upload_files(field, files, instance=instance, concurrency=concurrency)
+    try:
+        with transaction.atomic():
+            yield names
+    except BaseException:
+        delete_files(field.storage, names)
+        raise
@@ -1,4 +1,7 @@
+from django.conf import settings
 from django.urls import path
+from rest_framework.routers import DefaultRouter
+from rest_framework.routers import SimpleRouter
 
 from drf_spectacular.views import SpectacularAPIView
 from drf_spectacular.views import SpectacularRedocView
@@ -6,6 +9,12 @@ from drf_spectacular.views import SpectacularSwaggerView
 
 from . import rest_api as views
 
+if settings.DEBUG:
+    router = DefaultRouter()
+else:
+    router = SimpleRouter()
+
+router.register('export-jobs', views.ExportJobViewSet)
 
 urlpatterns = [
     path('docs/api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -15,4 +24,12 @@ urlpatterns = [
 
 urlpatterns += [
     path('import/table-data/', views.ImportTableData.as_view(), name='import-table-data'),
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache-stats'),
 ]
+
+urlpatterns += [
+    path('uploads/intent/', views.UploadIntentView.as_view(), name='upload-intent'),
+    path('uploads/confirm/', views.UploadConfirmView.as_view(), name='upload-confirm'),
+]
+
+urlpatterns += router.urls
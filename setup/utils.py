@@ -2,11 +2,40 @@ from PIL import Image
 from io import BytesIO
 from django.core.files.base import ContentFile
 import boto3
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError
 from django.conf import settings
 from django.http import JsonResponse
+import threading
+import time
 import uuid
 
+from setup.cache import LRUCache
+from setup.cache import CacheStats
+
+S3_MAX_POOL_CONNECTIONS = getattr(settings, 'S3_MAX_POOL_CONNECTIONS', 20)
+PRESIGNED_URL_CACHE_SIZE = getattr(settings, 'PRESIGNED_URL_CACHE_SIZE', 10000)
+# A cached url is signed again once it has less than this left. Keep it above
+# CONDITIONAL_GET_MAX_AGE, cached responses hold on to the urls that long
+PRESIGNED_URL_REFRESH_MARGIN = getattr(settings, 'PRESIGNED_URL_REFRESH_MARGIN', 30 * 60)
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+presigned_urls = LRUCache(PRESIGNED_URL_CACHE_SIZE)
+presigned_url_stats = CacheStats('presigned_url')
+
+def is_internal_field(model, field):
+    """
+        Fields kept up to date by the model itself (denormalized, search vector, renditions),
+        left out of the exports and the admin columns. The auto timestamps are kept.
+    """
+    if field.name in getattr(model, 'DENORMALIZED_FIELDS', ()):
+        return True
+    timestamp = getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    return not field.editable and not field.primary_key and not timestamp
+
+
 def generate_field_name(field):
     name = field.name
 
@@ -28,6 +57,9 @@ def generate_column(model, actions=True, default_fields=None):
     columns = []
 
     for dbfield in fields:
+        if is_internal_field(model, dbfield):
+            continue
+
         if dbfield.name in default_fields:
             columns.append({
                 "value": dbfield.name,
@@ -67,6 +99,65 @@ def compress_image(pic):
 
     return content_file
 
+def get_s3_client():
+    """
+        Function to get the S3 client of the process.
+
+        The client is built once, botocore clients are thread safe and the threads
+        share its pool of S3_MAX_POOL_CONNECTIONS connections.
+    """
+    global _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            _s3_client = boto3.session.Session().client(
+                's3',
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+                region_name=settings.AWS_S3_REGION_NAME,
+                config=Config(
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                    signature_version=getattr(settings, 'AWS_S3_SIGNATURE_VERSION', None),
+                ),
+            )
+        return _s3_client
+
+
+def cached_presigned_url(key, sign, expiration):
+    """
+        Function to reuse a presigned url until PRESIGNED_URL_REFRESH_MARGIN seconds before it expires.
+
+        :param key: What the url was signed for, eg: (bucket, object key, expiration).
+        :param sign: Callable signing a new url.
+        :param expiration: The expiration time of the url in seconds.
+        :return: The presigned url.
+    """
+    now = time.time()
+    cached = presigned_urls.get(key)
+    if cached is not None and cached[1] - PRESIGNED_URL_REFRESH_MARGIN > now:
+        presigned_url_stats.hit()
+        return cached[0]
+
+    presigned_url_stats.miss()
+    url = sign()
+    presigned_urls.set(key, (url, now + expiration))
+    return url
+
+
+def presign_urls(storage, names):
+    """
+        Function to get the urls of many files of a storage at once, eg: every image of a listing.
+
+        :param storage: The storage of the files.
+        :param names: The names of the files, empty names are skipped.
+        :return: dict of name and url.
+    """
+    names = [name for name in dict.fromkeys(names) if name]
+    if hasattr(storage, 'urls'):
+        return storage.urls(names)
+    return {name: storage.url(name) for name in names}
+
+
 def upload_image_to_wasabi(file):
     """
     Uploads an image file to Wasabi and returns the generated object key.
@@ -74,13 +165,7 @@ def upload_image_to_wasabi(file):
     :param file: The file object received in the request.
     :return: Dictionary containing success status and object key or error message.
     """
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        region_name=settings.AWS_S3_REGION_NAME,
-    )
+    s3_client = get_s3_client()
 
     # Generate a unique object key
     key = f"uploads/{uuid.uuid4()}_{file.name}"
@@ -112,23 +197,21 @@ def generate_presigned_url(object_key, expiration=3600):
     :param expiration: The expiration time of the URL in seconds (default is 1 hour).
     :return: Dictionary containing success status and the pre-signed URL or error message.
     """
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        region_name=settings.AWS_S3_REGION_NAME,
-    )
+    s3_client = get_s3_client()
 
     try:
-        # Generate the pre-signed URL
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                'Key': object_key
-            },
-            ExpiresIn=expiration
+        # Generate the pre-signed URL, or reuse the one signed earlier
+        presigned_url = cached_presigned_url(
+            (settings.AWS_STORAGE_BUCKET_NAME, object_key, expiration),
+            lambda: s3_client.generate_presigned_url(
+                'get_object',
+                Params={
+                    'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
+                    'Key': object_key
+                },
+                ExpiresIn=expiration
+            ),
+            expiration
         )
 
         return {
@@ -1,3 +1,7 @@
+import json
+import time
+from hashlib import md5
+
 from rest_framework import status
 from rest_framework import mixins
 from rest_framework import filters
@@ -5,14 +9,288 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.serializers import BaseSerializer
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 
 from setup.permissions import IsSuperUser
+from setup.serializer import prefetch_lookups
 from setup.utils import generate_column
+from setup.cache import get_model_versions
+from setup.cache import model_version_name
+from setup.cache import CacheStats
+
+# Image urls are presigned, cached payloads must be refetched before they expire
+CONDITIONAL_GET_MAX_AGE = getattr(settings, 'CONDITIONAL_GET_MAX_AGE', 30 * 60)
+RESPONSE_CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'shared')
+
+response_cache_stats = CacheStats('response')
+
+
+def flatten_select_related(select_related, prefix=''):
+    paths = []
+    for name, nested in select_related.items():
+        paths.append(prefix + name)
+        paths.extend(flatten_select_related(nested, f'{prefix}{name}__'))
+    return paths
+
+
+class SparseFieldsMixin:
+    """
+        Sparse fieldsets for the read actions of a viewset.
+
+        ?fields=name,price : render only these fields (a JSON list is accepted too), `id` is always kept.
+        ?expand=brand,categories : render these nested serializers, the others are skipped.
+
+        Without either parameter the full serializer is rendered. The select_related and
+        prefetch_related of the queryset are pruned to the rendered relations, and the
+        columns are narrowed with only() when every rendered field maps to a model field
+        (method fields are mapped through the `sparse_field_sources` of the serializer).
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+    sparse_actions = ('list', 'retrieve')
+
+    def get_query_param_set(self, name):
+        value = self.request.query_params.get(name, '').strip()
+        if not value:
+            return None
+        if value.startswith('['):
+            try:
+                return {str(item) for item in json.loads(value)}
+            except ValueError:
+                pass
+        return {item.strip() for item in value.split(',') if item.strip()}
+
+    def get_sparse_fields(self):
+        """
+            The requested fields and expansions, None when the full serializer is wanted.
+        """
+        if getattr(self, 'request', None) is None or self.action not in self.sparse_actions:
+            return None
+
+        requested = self.get_query_param_set(self.fields_query_param)
+        expand = self.get_query_param_set(self.expand_query_param)
+        if requested is None and expand is None:
+            return None
+        return requested, expand or set()
+
+    def get_rendered_fields(self, fields, sparse):
+        requested, expand = sparse
+        rendered = {}
+        for name, field in fields.items():
+            if requested is not None:
+                keep = name == 'id' or name in requested or name in expand
+            else:
+                keep = not isinstance(field, BaseSerializer) or name in expand
+            if keep:
+                rendered[name] = field
+        return rendered
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        sparse = self.get_sparse_fields()
+        if sparse is not None:
+            fields = getattr(serializer, 'child', serializer).fields
+            rendered = self.get_rendered_fields(fields, sparse)
+            for name in list(fields):
+                if name not in rendered:
+                    fields.pop(name)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        sparse = self.get_sparse_fields()
+        if sparse is None:
+            return queryset
+        return self.prune_queryset(queryset, sparse)
+
+    def prune_queryset(self, queryset, sparse):
+        serializer = self.get_serializer_class()(context={'request': self.request, 'view': self})
+        rendered = self.get_rendered_fields(serializer.fields, sparse)
+
+        model_fields = {field.name: field for field in queryset.model._meta.get_fields()}
+        roots, columns = set(), True
+        sources = getattr(serializer, 'sparse_field_sources', {})
+        for name, field in rendered.items():
+            root = sources.get(name, field.source).split('.')[0]
+            roots.add(root)
+            # Method fields and properties may read anything from the instance
+            if root not in model_fields and root not in queryset.query.annotations:
+                columns = False
+
+        if isinstance(queryset.query.select_related, dict):
+            select_related = [
+                path for path in flatten_select_related(queryset.query.select_related)
+                if path.split('__')[0] in roots
+            ]
+            queryset = queryset.select_related(None).select_related(*select_related)
+
+        prefetch_related = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split('__')[0] in roots
+        ]
+        queryset = queryset.prefetch_related(None).prefetch_related(*prefetch_related)
+
+        if columns:
+            # Ordering columns are kept too, the cursor pagination reads them from the rows
+            ordering = {
+                name.lstrip('-').split('__')[0]
+                for name in queryset.query.order_by or queryset.model._meta.ordering
+                if isinstance(name, str)
+            }
+            concrete = [
+                name for name in roots | ordering
+                if name in model_fields and model_fields[name].concrete
+            ]
+            queryset = queryset.only('pk', *concrete)
+        return queryset
+
+
+class PrefetchPlanMixin:
+    """
+        Joins and prefetches the relations the serializer of the read actions declares in
+        its `prefetch_plan`, so a page costs the same few queries whatever its size.
+
+        Put it before SparseFieldsMixin, the plan is pruned to the rendered fields with the
+        rest of the queryset.
+    """
+    prefetch_plan_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'action', None) not in self.prefetch_plan_actions:
+            return queryset
+
+        select_related, prefetch_related = prefetch_lookups(self.get_serializer_class(), queryset.model)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        return queryset.prefetch_related(*prefetch_related)
+
+
+class ConditionalGetMixin:
+    """
+        ETag and Last-Modified headers for the read actions of a viewset.
+
+        Both are derived from the version stamps of `conditional_models` (the queryset
+        model by default), which BaseModel bumps on every save; the models must set
+        `cache_versioned`. A request whose
+        If-None-Match or If-Modified-Since still matches gets a 304 before the action
+        runs, so no queryset is evaluated. The validators also roll over every
+        CONDITIONAL_GET_MAX_AGE seconds, the presigned urls of a payload expire.
+    """
+    conditional_models = ()
+    conditional_actions = ('list', 'retrieve')
+
+    def get_conditional_models(self):
+        return self.conditional_models or (self.queryset.model,)
+
+    def get_model_versions(self):
+        """
+            The version vector of the response, one stamp per conditional model.
+        """
+        models = self.get_conditional_models()
+        versions = get_model_versions(*models)
+        return [versions[model_version_name(model)] for model in models]
+
+    def get_conditional_validators(self, request, versions):
+        """
+            The ETag and the Last-Modified timestamp of the response to the request.
+        """
+        window = int(time.time() // CONDITIONAL_GET_MAX_AGE) * CONDITIONAL_GET_MAX_AGE
+
+        # The payload may depend on the user, eg: is_wishlisted
+        user = request.user.pk if request.user.is_authenticated else ''
+        key = '|'.join([
+            *map(str, versions), str(window), str(user),
+            request.get_full_path(), request.headers.get('Accept', ''),
+        ])
+        last_modified = max(window, *(version // 10 ** 9 for version in versions))
+        return f'"{md5(key.encode()).hexdigest()}"', last_modified
+
+    def respond_with(self, request, response):
+        # Answered in place of the action handler
+        setattr(self, request.method.lower(), lambda *args, **kwargs: response)
+        self.answered = True
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.model_versions = self.conditional_validators = None
+        self.answered = False
+        if request.method not in ('GET', 'HEAD') or self.action not in self.conditional_actions:
+            return
+
+        self.model_versions = self.get_model_versions()
+        etag, last_modified = self.conditional_validators = self.get_conditional_validators(
+            request, self.model_versions
+        )
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            self.respond_with(request, response)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'conditional_validators', None) and response.status_code in (200, 304):
+            etag, last_modified = self.conditional_validators
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, no_cache=True)
+        return response
+
+
+class ResponseCacheMixin(ConditionalGetMixin):
+    """
+        Cache of the rendered responses of a public, read only viewset.
+
+        Anonymous responses are cached under the path, the sorted query string, the
+        Accept header and the version vector of `conditional_models`. A save of any of
+        those models moves the key, so a cached response never outlives a write.
+    """
+
+    def get_response_cache_key(self, request, versions):
+        query = sorted(request.query_params.lists())
+        key = json.dumps([
+            request.path, query, request.headers.get('Accept', ''), versions,
+            int(time.time() // CONDITIONAL_GET_MAX_AGE),
+        ])
+        return f'response:{type(self).__name__}:{md5(key.encode()).hexdigest()}'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.response_cache_key = None
+        if self.model_versions is None or self.answered or request.user.is_authenticated:
+            return
+
+        self.response_cache_key = self.get_response_cache_key(request, self.model_versions)
+        cached = caches[RESPONSE_CACHE_ALIAS].get(self.response_cache_key)
+        if cached is None:
+            response_cache_stats.miss()
+            return
+
+        response_cache_stats.hit()
+        content, content_type = cached
+        self.respond_with(request, HttpResponse(content, content_type=content_type))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'response_cache_key', None) and not self.answered and response.status_code == 200:
+            key = self.response_cache_key
+            response.add_post_render_callback(
+                lambda rendered: caches[RESPONSE_CACHE_ALIAS].set(
+                    key, (rendered.content, rendered['Content-Type']), CONDITIONAL_GET_MAX_AGE
+                )
+            )
+        return response
 
 
 class BaseModelViewSet(
-    GenericViewSet, mixins.RetrieveModelMixin, mixins.ListModelMixin
+    SparseFieldsMixin, GenericViewSet, mixins.RetrieveModelMixin, mixins.ListModelMixin
 ):
     """
         BaseModelViewSet
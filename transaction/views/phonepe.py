@@ -160,6 +160,8 @@ class TransactionModelViewSet(GenericViewSet, ListModelMixin, ExportData):
     permission_classes = (IsAuthenticated, IsSuperUser,)
     queryset = Transaction.objects.all().order_by('-id')
     serializer_class = TransactionRetrieveSerializer
+    background_export = True
+    count_strategy = 'estimated'
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_class = TransactionFilter
     search_fields = ['transaction_id', 'status', 'order__user']
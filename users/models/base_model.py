@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from users.models import User
 from setup.middleware.request import CurrentRequestMiddleware
+from setup.cache import bump_model_version
 
 
 class BaseManager(models.Manager):
@@ -31,6 +34,10 @@ class BaseModel(models.Model):
 
     objects = BaseManager()
 
+    # Set on the models read by version stamped caches (conditional GETs, response and
+    # reference caches), only their saves bump the model version
+    cache_versioned = False
+
     def delete(self, *args, **kwargs):
         request_ = CurrentRequestMiddleware.get_request()
         user = request_.user if request_ else None
@@ -49,7 +56,16 @@ class BaseModel(models.Model):
                 if user.is_authenticated:
                     self.updated_by = user
         super().save(*args, **kwargs)
+        # Soft deletes go through save() as well
+        if self.cache_versioned:
+            bump_model_version(type(self))
 
     class Meta:
         abstract = True
         ordering = ['-updated_at']
+
+
+@receiver(post_delete)
+def base_model_hard_delete(sender, instance, **kwargs):
+    if isinstance(instance, BaseModel) and instance.cache_versioned:
+        bump_model_version(sender)